@@ -6,6 +6,7 @@ from .custom import CustomAgent
 from .dummy import DummyAgent
 from .few_shot import FewShotAgent
 from .naive import NaiveAgent
+from .planning import PlanningAgent
 from .robust_naive import RobustNaiveAgent
 from .robust_cot import RobustCoTAgent
 from .robust_cot_improved import RobustCoTImprovedAgent
@@ -14,8 +15,10 @@ from .chain_of_thought_rag import ChainOfThoughtRAGAgent
 from .naive_rag import NaiveRAGAgent
 from .robust_naive_rag import RobustNaiveRAGAgent
 from .robust_cot_improved_rag import RobustCoTImprovedRAGAgent
+from .tool_rag import ToolRAGAgent
 
 import logging
+
 logger = logging.getLogger(__name__)
 
 
@@ -77,5 +80,9 @@ class AgentFactory:
             return RobustCoTImprovedAgent(client_factory, prompt_builder, config=self.config)
         elif self.config.agent.type == "robust_cot_rag":
             return RobustCoTRAGAgent(client_factory, prompt_builder, config=self.config)
+        elif self.config.agent.type == "tool_rag":
+            return ToolRAGAgent(client_factory, prompt_builder, config=self.config)
+        elif self.config.agent.type == "planning":
+            return PlanningAgent(client_factory, prompt_builder, config=self.config)
         else:
             raise ValueError(f"Unknown agent type: {self.config.agent}")
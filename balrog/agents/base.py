@@ -5,6 +5,7 @@ class BaseAgent:
         """Initialize the agent with a client and prompt builder."""
         self.client = client_factory()
         self.prompt_builder = prompt_builder
+        self.prompt_builder.attach_client(self.client)
 
     def act(self, obs):
         """Generate an action based on the observation."""
@@ -15,6 +16,21 @@ class BaseAgent:
         self.prompt_builder.update_observation(observation)
         self.prompt_builder.update_action(action)
 
+    def degrade(self):
+        """Switch to a cheaper mode for the rest of the episode, when the budget runs low.
+
+        Returns:
+            bool: Whether the agent has a cheaper mode. Agents are restored by `reset`.
+        """
+        return False
+
+    def on_invalid_action(self, candidate):
+        """Called when the environment rejected the action returned by `act`.
+
+        Args:
+            candidate (str): The rejected action, replaced by the environment's default action.
+        """
+
     def reset(self):
         """Reset the prompt builder."""
         self.prompt_builder.reset()
@@ -3,6 +3,7 @@ import re
 
 from balrog.agents.base import BaseAgent
 from balrog.client import LLMClientWrapper
+from balrog.prompt_builder.history import overlay
 
 
 class ChainOfThoughtAgent(BaseAgent):
@@ -42,7 +43,7 @@ First think about what's the best course of action step by step.
 Finally, provide a single output action at the end of the message in the form of: ACTION: <action>
         """.strip()
 
-        messages[-1].content += "\n\n" + cot_instructions
+        messages = overlay(messages, cot_instructions)
 
         # Generate the CoT reasoning
         cot_reasoning = self.client.generate(messages)
@@ -70,4 +71,4 @@ Finally, provide a single output action at the end of the message in the form of
         answer = answer._replace(reasoning=answer.completion)
         answer = answer._replace(completion=filter_letters(answer.completion).split("ACTION:")[-1].strip())
 
-        return answer
\ No newline at end of file
+        return answer
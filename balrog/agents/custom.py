@@ -1,6 +1,7 @@
 import re
 
 from balrog.agents.base import BaseAgent
+from balrog.prompt_builder.history import overlay
 
 
 class CustomAgent(BaseAgent):
@@ -8,7 +9,6 @@ class CustomAgent(BaseAgent):
 
     def __init__(self, client_factory, prompt_builder):
         super().__init__(client_factory, prompt_builder)
-        self.client = client_factory()
         self.plan = None
 
     def act(self, obs, prev_action=None):
@@ -37,8 +37,7 @@ ACTION: <your next action>
         """.strip()
 
         messages = self.prompt_builder.get_prompt()
-        if messages and messages[-1].role == "user":
-            messages[-1].content += "\n\n" + plan_text + "\n" + planning_instructions
+        messages = overlay(messages, plan_text + "\n" + planning_instructions)
 
         response = self.client.generate(messages)
 
@@ -34,7 +34,6 @@ class DummyAgent(BaseAgent):
     def __init__(self, client_factory, prompt_builder):
         """Initialize the DummyAgent with a client and prompt builder."""
         super().__init__(client_factory, prompt_builder)
-        self.client = client_factory()
 
     def act(self, obs, prev_action=None):
         """Return a dummy action."""
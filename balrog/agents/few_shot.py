@@ -1,25 +1,15 @@
 import copy
 import re
-from typing import List, Optional
+from typing import List
 
 from balrog.agents.base import BaseAgent
-
-
-class Message:
-    def __init__(self, role: str, content: str, attachment: Optional[object] = None):
-        self.role = role  # 'system', 'user', 'assistant'
-        self.content = content  # String content of the message
-        self.attachment = attachment
-
-    def __repr__(self):
-        return f"Message(role={self.role}, content={self.content}, attachment={self.attachment})"
+from balrog.prompt_builder.history import Message, overlay
 
 
 class FewShotAgent(BaseAgent):
     def __init__(self, client_factory, prompt_builder, max_icl_history):
         """Initialize the FewShotAgent with a client and prompt builder."""
         super().__init__(client_factory, prompt_builder)
-        self.client = client_factory()
         self.icl_episodes = []
         self.icl_events = []
         self.max_icl_history = max_icl_history
@@ -125,8 +115,7 @@ class FewShotAgent(BaseAgent):
 You always have to output one of the above actions at a time and no other text. You always have to output an action until the episode terminates.
         """.strip()
 
-        if messages and messages[-1].role == "user":
-            messages[-1].content += "\n\n" + naive_instruction
+        messages = overlay(messages, naive_instruction)
 
         response = self.client.generate(messages)
 
@@ -2,6 +2,7 @@ import copy
 import re
 
 from balrog.agents.base import BaseAgent
+from balrog.prompt_builder.history import overlay
 
 
 class NaiveAgent(BaseAgent):
@@ -10,7 +11,6 @@ class NaiveAgent(BaseAgent):
     def __init__(self, client_factory, prompt_builder):
         """Initialize the NaiveAgent with a client and prompt builder."""
         super().__init__(client_factory, prompt_builder)
-        self.client = client_factory()
 
     def act(self, obs, prev_action=None):
         """Generate the next action based on the observation and previous action.
@@ -33,8 +33,7 @@ class NaiveAgent(BaseAgent):
 You always have to output one of the above actions at a time and no other text. You always have to output an action until the episode terminates.
         """.strip()
 
-        if messages and messages[-1].role == "user":
-            messages[-1].content += "\n\n" + naive_instruction
+        messages = overlay(messages, naive_instruction)
 
         response = self.client.generate(messages)
 
@@ -0,0 +1,223 @@
+import logging
+import time
+from collections import OrderedDict
+
+from balrog.agents.base import BaseAgent
+from balrog.prompt_builder.history import Message, overlay
+from balrog.retrieval import ChangeDetector, create_retriever
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """One step of an agent pipeline, such as query generation, retrieval or action selection."""
+
+    def __init__(self, name, run, cache_key=None, cache_size=1):
+        """Initialize the stage.
+
+        Args:
+            name (str): Name of the stage. Its output is stored under this name in the pipeline state.
+            run (callable): Called with the pipeline state; returns the output of the stage.
+            cache_key (callable, optional): Called with the pipeline state; returns a hashable key, or None
+                to run the stage. If the key was seen recently, the cached output is reused. Defaults to None.
+            cache_size (int, optional): Number of recent outputs to keep. Defaults to 1.
+        """
+        self.name = name
+        self.run = run
+        self.cache_key = cache_key
+        self.cache_size = cache_size
+
+
+class PipelineAgent(BaseAgent):
+    """An agent whose `act` runs a sequence of stages.
+
+    Each stage reads the outputs of the previous stages from a shared state dictionary. Every
+    stage is timed, the LLM calls it makes are attributed to it in the client's usage ledger,
+    and its output can be reused across steps through its cache key. The output of the last
+    stage is the agent's response.
+    """
+
+    def __init__(self, client_factory, prompt_builder):
+        """Initialize the agent with a client and prompt builder."""
+        super().__init__(client_factory, prompt_builder)
+        self.stages = self.build_stages()
+        self.stage_caches = {stage.name: OrderedDict() for stage in self.stages}
+        self.stage_stats = {}
+
+    def build_stages(self):
+        """Return the list of stages run at every step. Must be overridden by subclasses."""
+        raise NotImplementedError
+
+    def act(self, obs, prev_action=None):
+        """Run the pipeline on the current observation.
+
+        Args:
+            obs (dict): The current observation in the environment.
+            prev_action (str, optional): The previous action taken.
+
+        Returns:
+            LLMResponse: The output of the last stage.
+        """
+        if prev_action:
+            self.prompt_builder.update_action(prev_action)
+
+        self.prompt_builder.update_observation(obs)
+
+        state = {"obs": obs}
+        for stage in self.stages:
+            state[stage.name] = self.run_stage(stage, state)
+        return state[self.stages[-1].name]
+
+    def run_stage(self, stage, state):
+        """Run one stage, or reuse its cached output.
+
+        Args:
+            stage (Stage): The stage to run.
+            state (dict): Outputs of the previous stages, and the observation under "obs".
+
+        Returns:
+            Any: The output of the stage.
+        """
+        stats = self.stage_stats.setdefault(stage.name, {"calls": 0, "cache_hits": 0, "seconds": 0.0})
+        cache = self.stage_caches[stage.name]
+        key = stage.cache_key(state) if stage.cache_key is not None else None
+        if key is not None and key in cache:
+            cache.move_to_end(key)
+            stats["cache_hits"] += 1
+            return cache[key]
+
+        start = time.perf_counter()
+        try:
+            with self.client.ledger.stage(stage.name):
+                output = stage.run(state)
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            stats["calls"] += 1
+
+        if key is not None:
+            cache[key] = output
+            if len(cache) > stage.cache_size:
+                cache.popitem(last=False)
+        return output
+
+    def reset(self):
+        """Reset the prompt builder, the stage caches and the stage statistics."""
+        super().reset()
+        for cache in self.stage_caches.values():
+            cache.clear()
+        self.stage_stats = {}
+
+
+class RAGPipelineAgent(PipelineAgent):
+    """Pipeline shared by the RAG agents: query, retrieve, summarize, act, extract the answer.
+
+    Subclasses provide the prompts as class attributes and `_extract_final_answer`. Query
+    generation, retrieval and summarization are cached per situation: with
+    `rag_trigger=on_change`, they are reused until `ChangeDetector` reports a significant change.
+    When degraded, these stages are skipped and the action is asked for without wiki advice.
+    """
+
+    # Appended to the prompt to ask for a wiki query, answered as "Query: <query>"
+    query_prompt = None
+    # Summarization prompt, formatted with `context` and `rag_context`
+    summary_prompt = None
+    # Appended to the prompt to pass the summary on, formatted with `rag_summary`
+    rag_usage_prompt = None
+    # Appended to the prompt after the summary, to ask for the action
+    action_instructions = None
+
+    def __init__(self, client_factory, prompt_builder, config):
+        """Initialize the agent.
+
+        Args:
+            client_factory (LLMClientWrapper): A factory for creating the LLM client instance.
+            prompt_builder (PromptBuilder): Object to build prompts for the agent.
+            config: Configuration object containing settings for the agent.
+        """
+        self.retriever = create_retriever(config)
+        self.rag_query_mode = config.agent.rag_query_mode
+        self.rag_trigger = ChangeDetector(
+            enabled=config.agent.rag_trigger == "on_change", max_reuse=config.agent.rag_max_reuse
+        )
+        self.situation = 0
+        self.rag_enabled = True
+        super().__init__(client_factory, prompt_builder)
+
+    def build_stages(self):
+        """Return the stages of the RAG pipeline."""
+
+        def situation_key(state):
+            return state["situation"]
+
+        return [
+            Stage("prompt", lambda state: self.prompt_builder.get_prompt()),
+            Stage("situation", self._update_situation),
+            Stage("query", self._generate_rag_query, cache_key=situation_key),
+            Stage("retrieval", self._retrieve, cache_key=situation_key),
+            Stage("summary", self._summarize_rag, cache_key=situation_key),
+            Stage("action", self._select_action),
+            Stage("answer", lambda state: self._extract_final_answer(state["action"])),
+        ]
+
+    def reset(self):
+        """Reset the prompt builder and forget the last retrieval."""
+        super().reset()
+        self.rag_trigger.reset()
+        self.situation = 0
+        self.rag_enabled = True
+
+    def degrade(self):
+        """Stop querying the wiki for the rest of the episode."""
+        self.rag_enabled = False
+        for cache in self.stage_caches.values():
+            cache.clear()
+        return True
+
+    def _update_situation(self, state):
+        """Return an id that changes whenever the game situation changes significantly."""
+        if self.rag_trigger.update(state["obs"]):
+            self.situation += 1
+        return self.situation
+
+    def _generate_rag_query(self, state):
+        """Ask the LLM for a short wiki query about the current game state."""
+        if self.rag_query_mode == "observation" or not self.rag_enabled:
+            return None
+
+        rag_response = self.client.generate(overlay(state["prompt"], self.query_prompt))
+        rag_query = rag_response.completion.split("Query:")[1].strip()
+        logger.info(f"RAG query: {rag_query}")
+        return rag_query
+
+    def _retrieve(self, state):
+        """Retrieve wiki articles for the query, or for what is on screen in observation mode."""
+        if not self.rag_enabled:
+            return []
+        if self.rag_query_mode == "observation":
+            return self.retriever.search_observation(state["obs"])
+        return self.retriever.search(state["query"])
+
+    def _summarize_rag(self, state):
+        """Summarize the retrieved articles for the current game state with the LLM."""
+        if not self.rag_enabled:
+            return None
+        obs = state["obs"]
+        short_term_context = obs["text"]["short_term_context"]
+        long_term_context = obs["text"].get("long_term_context", "")
+        context = f"{short_term_context} {long_term_context}".strip()
+        logger.debug(f"Context: {context}")
+
+        rag_context = "\n".join(state["retrieval"])
+        rag_context_summary = self.summary_prompt.format(context=context, rag_context=rag_context)
+        return self.client.generate([Message(role="user", content=rag_context_summary)]).completion
+
+    def _select_action(self, state):
+        """Ask the LLM for the next action, given the summary of the retrieved articles."""
+        messages = state["prompt"]
+        if state["summary"] is not None:
+            messages = overlay(messages, self.rag_usage_prompt.format(rag_summary=state["summary"]))
+        return self.client.generate(overlay(messages, self.action_instructions))
+
+    def _extract_final_answer(self, response):
+        """Extract the action from the LLM response. Must be overridden by subclasses."""
+        raise NotImplementedError
@@ -0,0 +1,117 @@
+import logging
+import re
+from collections import deque
+
+from balrog.agents.pipeline import PipelineAgent, Stage
+from balrog.client import LLMClientWrapper
+from balrog.prompt_builder.history import overlay
+from balrog.retrieval import ChangeDetector
+
+logger = logging.getLogger(__name__)
+
+
+class PlanningAgent(PipelineAgent):
+    """An agent that asks for a short plan of actions and executes it without re-querying the LLM.
+
+    The LLM answers with up to `max_plan_length` actions. They are returned one per step, and
+    a new plan is requested when the plan is exhausted, when the situation changes in a way the
+    plan could not anticipate (a new message, monster or item, lost hit points; see
+    `ChangeDetector`), or when an action of the plan turns out to be invalid.
+    """
+
+    def __init__(self, client_factory: LLMClientWrapper, prompt_builder, config):
+        """Initialize the PlanningAgent with a client, prompt builder, and configuration.
+
+        Args:
+            client_factory (LLMClientWrapper): A factory for creating the LLM client instance.
+            prompt_builder (PromptBuilder): Object to build prompts for the agent.
+            config: Configuration object containing settings for the agent.
+        """
+        self.max_plan_length = config.agent.max_plan_length
+        self.surprise = ChangeDetector(max_reuse=self.max_plan_length)
+        self.plan = deque()
+        self.plan_id = 0
+        self.invalid_action = False
+        self.new_plan = False
+        super().__init__(client_factory, prompt_builder)
+
+    def build_stages(self):
+        """Return the stages: decide whether to re-plan, plan (cached per plan), and pop the next action."""
+        return [
+            Stage("surprise", self._update_plan_id),
+            Stage("plan", self._make_plan, cache_key=lambda state: state["surprise"]),
+            Stage("answer", self._next_action),
+        ]
+
+    def reset(self):
+        """Reset the prompt builder and drop the current plan."""
+        super().reset()
+        self.surprise.reset()
+        self.plan.clear()
+        self.plan_id = 0
+        self.invalid_action = False
+        self.new_plan = False
+
+    def on_invalid_action(self, candidate):
+        """Drop the rest of the plan, since it was made expecting `candidate` to be valid."""
+        self.invalid_action = True
+
+    def _update_plan_id(self, state):
+        """Return an id that changes whenever a new plan is needed."""
+        surprised = self.surprise.update(state["obs"])
+        if not self.plan:
+            self.plan_id += 1
+        elif self.invalid_action or surprised:
+            logger.info(f"Re-planning, {len(self.plan)} planned actions dropped")
+            self.plan_id += 1
+        self.invalid_action = False
+        return self.plan_id
+
+    def _make_plan(self, state):
+        """Ask the LLM for a plan and queue its actions."""
+        planning_instructions = f"""
+First, think about the best course of action in not more than 30 words.
+Then, plan your next moves: choose up to {self.max_plan_length} actions from the list of actions given, to be executed in order, and output them separated by semicolons strictly in the following format:
+
+<|PLAN|>ACTION_1; ACTION_2; ACTION_3<|END|>
+
+Only plan as far ahead as you can predict the outcome. If something unexpected happens, you will be asked for a new plan.
+        """.strip()
+
+        messages = overlay(self.prompt_builder.get_prompt(), planning_instructions)
+        response = self.client.generate(messages)
+        self.plan = deque(self._parse_plan(response.completion))
+        self.new_plan = True
+        return response
+
+    def _parse_plan(self, completion):
+        """Extract the planned actions from the LLM response.
+
+        Args:
+            completion (str): The LLM response.
+
+        Returns:
+            list: The planned actions, at most `max_plan_length`, and at least one.
+        """
+        match = re.search(r"<\|PLAN\|>(.*?)<\|END\|>", completion, re.DOTALL)
+        if match:
+            actions = [action.strip() for action in match.group(1).split(";") if action.strip()]
+        else:
+            actions = []
+        if not actions:
+            # A single invalid action, so that the environment default is used and the agent re-plans
+            actions = ["Failed to obtain a valid plan from the reasoning."]
+        return actions[: self.max_plan_length]
+
+    def _next_action(self, state):
+        """Return the next action of the plan.
+
+        Returns:
+            LLMResponse: The action in `completion` and the plan in `reasoning`. Only the step that
+                requested the plan carries its token counts.
+        """
+        response = state["plan"]
+        if not self.new_plan:
+            response = response._replace(input_tokens=0, output_tokens=0)
+        self.new_plan = False
+        return response._replace(completion=self.plan.popleft(), reasoning=response.completion)
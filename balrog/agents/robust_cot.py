@@ -3,6 +3,7 @@ import re
 
 from balrog.agents.base import BaseAgent
 from balrog.client import LLMClientWrapper
+from balrog.prompt_builder.history import overlay
 
 
 class RobustCoTAgent(BaseAgent):
@@ -47,7 +48,7 @@ Replace YOUR_CHOSEN_ACTION with the chosen action.
         """.strip()
 
         # Add the updated instructions to the last message
-        messages[-1].content += "\n\n" + cot_instructions
+        messages = overlay(messages, cot_instructions)
 
         # Generate the CoT reasoning
         cot_reasoning = self.client.generate(messages)
@@ -3,6 +3,7 @@ import re
 
 from balrog.agents.base import BaseAgent
 from balrog.client import LLMClientWrapper
+from balrog.prompt_builder.history import overlay
 
 
 class RobustCoTImprovedAgent(BaseAgent):
@@ -51,7 +52,7 @@ Explain your action choice in not more than 20 words.
         """.strip()
 
         # Add the updated instructions to the last message
-        messages[-1].content += "\n\n" + cot_instructions
+        messages = overlay(messages, cot_instructions)
 
         # Generate the CoT reasoning
         cot_reasoning = self.client.generate(messages)
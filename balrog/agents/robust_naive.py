@@ -2,6 +2,7 @@ import copy
 import re
 
 from balrog.agents.base import BaseAgent
+from balrog.prompt_builder.history import overlay
 
 
 class RobustNaiveAgent(BaseAgent):
@@ -10,7 +11,6 @@ class RobustNaiveAgent(BaseAgent):
     def __init__(self, client_factory, prompt_builder):
         """Initialize the NaiveAgent with a client and prompt builder."""
         super().__init__(client_factory, prompt_builder)
-        self.client = client_factory()
 
     def act(self, obs, prev_action=None):
         """Generate the next action based on the observation and previous action.
@@ -38,8 +38,7 @@ You must choose exactly one of the listed actions and output it strictly in the
 Replace YOUR_CHOSEN_ACTION with the chosen action. Output no other text, explanation, or reasoning.
 """.strip()
 
-        if messages and messages[-1].role == "user":
-            messages[-1].content += "\n\n" + naive_instruction
+        messages = overlay(messages, naive_instruction)
 
         response = self.client.generate(messages)
         final_answer = self._extract_final_answer(response)
@@ -0,0 +1,121 @@
+import copy
+import logging
+import re
+
+from balrog.agents.pipeline import PipelineAgent, Stage
+from balrog.client import LLMClientWrapper
+from balrog.prompt_builder.history import overlay
+from balrog.retrieval import create_retriever
+
+logger = logging.getLogger(__name__)
+
+SEARCH_WIKI_TOOL = {
+    "name": "search_wiki",
+    "description": (
+        "Search the NetHack Wiki for strategic advice about monsters, items, features or situations. "
+        "Only use it when the game state involves something you are unsure how to handle."
+    ),
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": 'A short phrase (maximum 8 words), e.g. "Uses for wand" or "Defeat dragon".',
+            }
+        },
+        "required": ["query"],
+    },
+}
+
+
+class ToolRAGAgent(PipelineAgent):
+    """A chain-of-thought agent that consults the NetHack Wiki through tool calling.
+
+    Instead of separate requests for the query, the summary and the action, the model gets a
+    `search_wiki` tool in the action request. The search runs locally and the results are
+    returned in the same conversation; when the model does not call the tool, the step costs
+    a single request.
+    """
+
+    def __init__(self, client_factory: LLMClientWrapper, prompt_builder, config):
+        """Initialize the ToolRAGAgent with a client, prompt builder, and configuration.
+
+        Args:
+            client_factory (LLMClientWrapper): A factory for creating the LLM client instance.
+            prompt_builder (PromptBuilder): Object to build prompts for the agent.
+            config: Configuration object containing settings for the agent.
+        """
+        self.retriever = create_retriever(config)
+        self.max_tool_rounds = config.agent.max_tool_rounds
+        self.tool_rounds = self.max_tool_rounds
+        super().__init__(client_factory, prompt_builder)
+
+    def build_stages(self):
+        """Return the stages: one action request with the tool available, then answer extraction."""
+        return [
+            Stage("action", self._select_action),
+            Stage("answer", lambda state: self._extract_final_answer(state["action"])),
+        ]
+
+    def reset(self):
+        """Reset the prompt builder and allow wiki searches again."""
+        super().reset()
+        self.tool_rounds = self.max_tool_rounds
+
+    def degrade(self):
+        """Stop offering the search tool for the rest of the episode."""
+        self.tool_rounds = 0
+        return True
+
+    def _select_action(self, state):
+        """Ask the LLM for the next action, searching the wiki if it asks to."""
+        messages = self.prompt_builder.get_prompt()
+
+        cot_instructions = """
+If the current situation involves a monster, item or feature you are unsure about, you may call the search_wiki tool before answering.
+First, think about the best course of action.
+Then, you must choose exactly one of the listed actions and output it strictly in the following format:
+
+<|ACTION|>YOUR_CHOSEN_ACTION<|END|>
+
+Replace YOUR_CHOSEN_ACTION with the chosen action. Verify that the action you provided is a valid action from the list of actions given.
+
+In case you want to choose the action "go forward", you must output:
+<|ACTION|>go forward<|END|>
+Explain your action choice in not more than 20 words.
+        """.strip()
+
+        messages = overlay(messages, cot_instructions)
+
+        return self.client.generate_with_tools(
+            messages, [SEARCH_WIKI_TOOL], self._run_tool, max_tool_rounds=self.tool_rounds
+        )
+
+    def _run_tool(self, name, arguments):
+        """Run a tool call requested by the model."""
+        if name != SEARCH_WIKI_TOOL["name"]:
+            raise ValueError(f"Unknown tool: {name}")
+        query = arguments["query"]
+        logger.info(f"RAG query: {query}")
+        return "\n".join(self.retriever.search(query)) or "No results."
+
+    def _extract_final_answer(self, reasoning):
+        """Extract the final action from the chain-of-thought reasoning response.
+
+        Args:
+            reasoning (LLMResponse): The response containing CoT reasoning and action.
+
+        Returns:
+            LLMResponse: The response with the extracted final action in `completion`
+                         and the entire chain-of-thought in `reasoning`.
+        """
+        final_answer = copy.deepcopy(reasoning)
+        final_answer = final_answer._replace(reasoning=reasoning.completion)
+
+        match = re.search(r"<\|ACTION\|>(.*?)<\|END\|>", reasoning.completion, re.DOTALL)
+        if match:
+            extracted_action = match.group(1).strip()
+        else:
+            extracted_action = "Failed to obtain a valid action from the reasoning."
+
+        return final_answer._replace(completion=extracted_action)
@@ -0,0 +1,102 @@
+import logging
+import multiprocessing
+import time
+
+logger = logging.getLogger(__name__)
+
+# Spending that a budget can limit. Token and cost usage come from the client's usage ledger;
+# "seconds" is the wall-clock time of the episode, or of the whole run.
+LIMITS = ("input_tokens", "output_tokens", "cost_usd", "seconds")
+
+
+class RunBudget:
+    """Spending limits for a whole evaluation run.
+
+    The usage is kept in shared memory, so worker processes forked after the budget is created
+    all add to, and check, the same totals.
+    """
+
+    def __init__(self, budget_config):
+        """Initialize the run budget.
+
+        Args:
+            budget_config (omegaconf.DictConfig): The `eval.budget` config section.
+        """
+        self.limits = {name: budget_config.run.get(name) for name in LIMITS}
+        self.usage = multiprocessing.Array("d", len(LIMITS))
+        self.start_time = time.time()
+
+    def add(self, usage):
+        """Add the usage of an episode step to the run totals.
+
+        Args:
+            usage (dict): Usage per limit name; missing names count as 0.
+        """
+        with self.usage.get_lock():
+            for i, name in enumerate(LIMITS):
+                self.usage[i] += usage.get(name, 0)
+
+    def totals(self):
+        """Return the usage of the run so far, per limit name."""
+        totals = dict(zip(LIMITS, self.usage[:]))
+        totals["seconds"] = time.time() - self.start_time
+        return totals
+
+    def exhausted(self, fraction=1.0):
+        """Return the reason why the run has used `fraction` of one of its limits, or None."""
+        return _exceeded("run", self.limits, self.totals(), fraction)
+
+
+class EpisodeBudget:
+    """Spending limits for one episode, which also charges its usage to the run budget."""
+
+    def __init__(self, budget_config, run_budget=None):
+        """Initialize the episode budget.
+
+        Args:
+            budget_config (omegaconf.DictConfig): The `eval.budget` config section.
+            run_budget (RunBudget, optional): Budget of the run the episode belongs to. Defaults to None.
+        """
+        self.limits = {name: budget_config.episode.get(name) for name in LIMITS}
+        self.degrade_at = budget_config.degrade_at
+        self.run_budget = run_budget
+        self.start_time = time.time()
+        self.usage = dict.fromkeys(LIMITS, 0)
+
+    def update(self, ledger_totals):
+        """Bring the episode usage up to date with the client's usage ledger.
+
+        Args:
+            ledger_totals (dict): Running totals of the ledger, which is reset at the start of the episode.
+        """
+        delta = {name: ledger_totals[name] - self.usage[name] for name in ("input_tokens", "output_tokens", "cost_usd")}
+        for name, value in delta.items():
+            self.usage[name] += value
+        self.usage["seconds"] = time.time() - self.start_time
+        if self.run_budget is not None:
+            self.run_budget.add(delta)
+
+    def exhausted(self):
+        """Return the reason why the episode must stop, or None."""
+        return self._check(1.0)
+
+    def running_low(self):
+        """Return the reason why the agent should switch to a cheaper mode, or None if it need not."""
+        if self.degrade_at is None:
+            return None
+        return self._check(self.degrade_at)
+
+    def _check(self, fraction):
+        reason = _exceeded("episode", self.limits, self.usage, fraction)
+        if reason is None and self.run_budget is not None:
+            reason = self.run_budget.exhausted(fraction)
+        return reason
+
+
+def _exceeded(scope, limits, usage, fraction):
+    """Return a description of the first limit that `usage` has reached `fraction` of, or None."""
+    for name in LIMITS:
+        limit = limits[name]
+        if limit is not None and usage[name] >= fraction * limit:
+            return f"{scope} {name} budget: {usage[name]:.6g} of {limit:.6g}"
+    return None
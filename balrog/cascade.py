@@ -0,0 +1,141 @@
+import logging
+import re
+from collections import Counter
+
+from omegaconf import OmegaConf
+
+from balrog.client import LLMClientWrapper, create_llm_client
+from balrog.retrieval import ChangeDetector
+
+logger = logging.getLogger(__name__)
+
+# Completions in which the model says it is unsure of its choice
+LOW_CONFIDENCE_PATTERN = re.compile(r"\b(not sure|unsure|uncertain|I don't know|unclear|no idea)\b", re.IGNORECASE)
+# Stop reasons of completions cut off by the token limit (OpenAI, Claude, Gemini)
+TRUNCATED_STOP_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+# Settings of the `client.cascade` section that override the client config for the cheap model
+CHEAP_MODEL_KEYS = ("client_name", "model_id", "base_url")
+
+
+class CascadeClient(LLMClientWrapper):
+    """Sends each step to a cheap model, and escalates to the strong model when the step looks hard.
+
+    A step is escalated before the agent acts when the previous action was invalid, a new monster,
+    object or feature came into view, the player lost hit points, or the progression has not
+    increased for `stall_steps` steps. Within a step, a response of the cheap model that is empty,
+    truncated or hedging is discarded and the request is repeated with the strong model. Once a
+    step is escalated, all its remaining requests go to the strong model.
+    """
+
+    def __init__(self, client_config, cheap_client, strong_client):
+        """Initialize the cascade.
+
+        Args:
+            client_config: Configuration of the strong model, with the `cascade` section.
+            cheap_client (LLMClientWrapper): Client of the model used by default.
+            strong_client (LLMClientWrapper): Client of the model used for escalated steps.
+        """
+        super().__init__(client_config)
+        self.cheap = cheap_client
+        self.strong = strong_client
+        # Both models record into the cascade's ledger, so usage is reported per model and per stage
+        self.cheap.ledger = self.strong.ledger = self.ledger
+        self.stall_steps = client_config.cascade.stall_steps
+        self.detector = ChangeDetector()
+        self.reset()
+
+    @classmethod
+    def from_config(cls, client_config):
+        """Create the cascade from a client config whose `cascade.model_id` names the cheap model."""
+        cascade = {
+            key: value for key, value in client_config.cascade.items() if key in CHEAP_MODEL_KEYS and value is not None
+        }
+        cheap_config = OmegaConf.merge(client_config, {"cascade": None}, cascade)
+        strong_config = OmegaConf.merge(client_config, {"cascade": None})
+        return cls(client_config, create_llm_client(cheap_config)(), create_llm_client(strong_config)())
+
+    def reset(self):
+        """Forget the previous steps and the escalation statistics, at the start of an episode."""
+        self.situation = None
+        self.escalation = None
+        self.best_progression = None
+        self.steps_without_progress = 0
+        self.steps = 0
+        self.escalated_steps = 0
+        self.escalations = Counter()
+
+    def start_step(self, obs, invalid_action=False, progression=None):
+        """Decide whether the coming step goes to the strong model.
+
+        Args:
+            obs (dict): The current observation in the environment.
+            invalid_action (bool, optional): Whether the previous action was invalid. Defaults to False.
+            progression (float, optional): Current progression of the episode, if the environment reports it.
+        """
+        self.steps += 1
+        self.escalation = None
+        previous, current = self.situation, self.detector.snapshot(obs)
+        self.situation = current
+
+        if progression is not None:
+            if self.best_progression is None or progression > self.best_progression:
+                self.best_progression = progression
+                self.steps_without_progress = 0
+            else:
+                self.steps_without_progress += 1
+
+        if invalid_action:
+            self.escalate("invalid action")
+        elif previous is not None and current["entities"] - previous["entities"]:
+            self.escalate("new entity in view")
+        elif previous is not None and current["hitpoints"] is not None and current["hitpoints"] < previous["hitpoints"]:
+            self.escalate("lost hit points")
+        elif self.steps_without_progress >= self.stall_steps:
+            self.steps_without_progress = 0
+            self.escalate("stalled progress")
+
+    def escalate(self, reason):
+        """Send the remaining requests of the current step to the strong model."""
+        if self.escalation is None:
+            logger.info(f"Escalating to {self.strong.model_id}: {reason}")
+            self.escalation = reason
+            self.escalated_steps += 1
+            self.escalations[reason] += 1
+
+    def generate(self, messages):
+        """Generate a response with the cheap model, or the strong model if the step is escalated."""
+        return self._route(lambda client: client.generate(messages))
+
+    def generate_with_tools(self, messages, tools, tool_handler, max_tool_rounds=1):
+        """Generate a response with tools, with the cheap model or the strong model if the step is escalated."""
+        return self._route(lambda client: client.generate_with_tools(messages, tools, tool_handler, max_tool_rounds))
+
+    def _route(self, request):
+        if self.escalation is None:
+            response = request(self.cheap)
+            reason = self.check_response(response)
+            if reason is None:
+                return response
+            self.escalate(reason)
+        return request(self.strong)
+
+    def check_response(self, response):
+        """Return why a response of the cheap model should not be trusted, or None."""
+        if not response.completion:
+            return "empty response"
+        if response.stop_reason in TRUNCATED_STOP_REASONS:
+            return "truncated response"
+        if LOW_CONFIDENCE_PATTERN.search(response.completion):
+            return "low confidence"
+        return None
+
+    def summary(self):
+        """Return the models and the escalation statistics of the episode."""
+        return {
+            "cheap_model_id": self.cheap.model_id,
+            "strong_model_id": self.strong.model_id,
+            "steps": self.steps,
+            "escalated_steps": self.escalated_steps,
+            "escalation_rate": self.escalated_steps / self.steps if self.steps else 0.0,
+            "escalations": dict(self.escalations),
+        }
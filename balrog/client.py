@@ -1,15 +1,17 @@
-import base64
 import datetime
+import json
 import logging
 import time
 from collections import namedtuple
-from io import BytesIO
+from contextlib import contextmanager
 
 import google.generativeai as genai
 from anthropic import Anthropic
 from google.generativeai import caching
 from openai import OpenAI
 
+from balrog.prompt_builder.images import encode_image
+
 LLMResponse = namedtuple(
     "LLMResponse",
     [
@@ -22,11 +24,143 @@ LLMResponse = namedtuple(
     ],
 )
 
+# USD per million tokens. `cached_input` is the price of prompt tokens read from the provider's cache,
+# `cache_write` the price of prompt tokens written to it (Anthropic only). Override or extend with `client.prices`.
+MODEL_PRICES = {
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gemini-1.5-flash": {"input": 0.075, "cached_input": 0.01875, "output": 0.30},
+    "gemini-2.0-flash": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "claude-3-5-sonnet-20240620": {"input": 3.00, "cached_input": 0.30, "cache_write": 3.75, "output": 15.00},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "cached_input": 0.08, "cache_write": 1.00, "output": 4.00},
+}
+
 httpx_logger = logging.getLogger("httpx")
 httpx_logger.setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
+def cache_hit_rate(cached_tokens, input_tokens):
+    """Return the share of prompt tokens that were read from the provider's prompt cache."""
+    return cached_tokens / input_tokens if input_tokens else 0.0
+
+
+class UsageLedger:
+    """Records the token usage, latency and estimated cost of every LLM call made by a client.
+
+    Calls are attributed to the innermost active `stage`, so that the query generation,
+    summarization and action calls of an agent are reported separately.
+    """
+
+    def __init__(self, prices=None):
+        """Initialize the ledger.
+
+        Args:
+            prices (dict, optional): Per-model prices in USD per million tokens, merged over `MODEL_PRICES`.
+        """
+        self.prices = {**MODEL_PRICES, **(prices or {})}
+        self.records = []
+        self.totals = {"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+        self.stages = []
+        self._unpriced = set()
+
+    @contextmanager
+    def stage(self, name):
+        """Attribute the calls made inside the `with` block to stage `name`."""
+        self.stages.append(name)
+        try:
+            yield
+        finally:
+            self.stages.pop()
+
+    def record(self, model_id, input_tokens, output_tokens, latency, cached_tokens=0, cache_write_tokens=0):
+        """Record one LLM call.
+
+        Args:
+            model_id (str): Model that served the call.
+            input_tokens (int): All prompt tokens, including cached ones.
+            output_tokens (int): Generated tokens.
+            latency (float): Wall-clock time of the call in seconds, including retries.
+            cached_tokens (int, optional): Prompt tokens read from the provider's cache. Defaults to 0.
+            cache_write_tokens (int, optional): Prompt tokens written to the provider's cache. Defaults to 0.
+
+        Returns:
+            dict: The record of the call.
+        """
+        cost_usd = self.cost(model_id, input_tokens, output_tokens, cached_tokens, cache_write_tokens)
+        record = {
+            "stage": self.stages[-1] if self.stages else "other",
+            "model_id": model_id,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "latency": latency,
+            "cost_usd": cost_usd,
+        }
+        self.records.append(record)
+        self.totals["input_tokens"] += input_tokens
+        self.totals["output_tokens"] += output_tokens
+        self.totals["cost_usd"] += cost_usd
+        return record
+
+    def cost(self, model_id, input_tokens, output_tokens, cached_tokens=0, cache_write_tokens=0):
+        """Estimate the cost of a call in USD; 0 for models without a known price."""
+        price = self.prices.get(model_id)
+        if price is None:
+            if model_id not in self._unpriced:
+                logger.warning(f"No price known for model {model_id}, its cost is reported as 0.")
+                self._unpriced.add(model_id)
+            return 0.0
+        uncached_tokens = input_tokens - cached_tokens - cache_write_tokens
+        return (
+            uncached_tokens * price["input"]
+            + cached_tokens * price.get("cached_input", price["input"])
+            + cache_write_tokens * price.get("cache_write", price["input"])
+            + output_tokens * price["output"]
+        ) / 1e6
+
+    def summary(self):
+        """Aggregate the recorded calls.
+
+        Returns:
+            dict: Totals over all calls (`llm_calls`, `input_tokens`, `output_tokens`, `cached_tokens`,
+                `llm_latency`, `cost_usd`), the share of prompt tokens read from the provider's cache
+                (`cache_hit_rate`), and the same totals per stage under `usage_by_stage` and per model
+                under `usage_by_model`.
+        """
+        fields = ["input_tokens", "output_tokens", "cached_tokens", "latency", "cost_usd"]
+        usage_by_stage = {}
+        usage_by_model = {}
+        for record in self.records:
+            for usage in (
+                usage_by_stage.setdefault(record["stage"], {"calls": 0, **{field: 0 for field in fields}}),
+                usage_by_model.setdefault(record["model_id"], {"calls": 0, **{field: 0 for field in fields}}),
+            ):
+                usage["calls"] += 1
+                for field in fields:
+                    usage[field] += record[field]
+        return {
+            "llm_calls": len(self.records),
+            "input_tokens": sum(record["input_tokens"] for record in self.records),
+            "output_tokens": sum(record["output_tokens"] for record in self.records),
+            "cached_tokens": sum(record["cached_tokens"] for record in self.records),
+            "llm_latency": sum(record["latency"] for record in self.records),
+            "cost_usd": sum(record["cost_usd"] for record in self.records),
+            "cache_hit_rate": cache_hit_rate(
+                sum(record["cached_tokens"] for record in self.records),
+                sum(record["input_tokens"] for record in self.records),
+            ),
+            "usage_by_stage": usage_by_stage,
+            "usage_by_model": usage_by_model,
+        }
+
+    def reset(self):
+        """Forget all recorded calls."""
+        self.records = []
+        self.totals = {"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+
 class LLMClientWrapper:
     """Base class for LLM client wrappers.
 
@@ -49,6 +183,7 @@ class LLMClientWrapper:
         self.max_retries = client_config.max_retries
         self.delay = client_config.delay
         self.alternate_roles = client_config.alternate_roles
+        self.ledger = UsageLedger(client_config.get("prices", None))
 
     def generate(self, messages):
         """Generate a response from the LLM given a list of messages.
@@ -63,6 +198,55 @@ class LLMClientWrapper:
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
+    def generate_with_tools(self, messages, tools, tool_handler, max_tool_rounds=1):
+        """Generate a response, letting the LLM call tools that are run locally.
+
+        Tool results are appended to the same conversation and the LLM is called again, until it
+        answers without calling a tool. If it does not ask for a tool, this is a single request.
+        This method should be overridden by subclasses.
+
+        Args:
+            messages (list): A list of messages to send to the LLM.
+            tools (list): Tool specifications with a `name`, a `description` and JSON schema `parameters`.
+            tool_handler (callable): Called as `tool_handler(name, arguments)`; returns the tool result as a string.
+            max_tool_rounds (int, optional): Maximum number of rounds of tool calls. Defaults to 1.
+
+        Returns:
+            LLMResponse: The final response, with token counts summed over all requests.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def run_tool(self, tool_handler, name, arguments):
+        """Run a tool requested by the LLM, turning malformed calls into an error message for the LLM.
+
+        Args:
+            tool_handler (callable): Called as `tool_handler(name, arguments)`.
+            name (str): Name of the requested tool.
+            arguments (dict or str): Tool arguments, possibly as a JSON string.
+
+        Returns:
+            str: The tool result.
+        """
+        try:
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments or "{}")
+            return str(tool_handler(name, arguments))
+        except Exception as e:
+            logger.error(f"Tool call {name}({arguments}) failed: {e}")
+            return f"Error: {e}"
+
+    def record_usage(self, response, latency):
+        """Record the usage of one API response in the ledger. Must be overridden by subclasses.
+
+        Args:
+            response: The raw API response.
+            latency (float): Wall-clock time of the call in seconds.
+
+        Returns:
+            dict: The ledger record, whose `input_tokens` and `output_tokens` are reported in the `LLMResponse`.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
     def execute_with_retries(self, func, *args, **kwargs):
         """Execute a function with retries upon failure.
 
@@ -93,18 +277,16 @@ def process_image_openai(image):
     """Process an image for OpenAI API by converting it to base64.
 
     Args:
-        image: The image to process.
+        image: The image to process, a PIL image or an `EncodedImage` from the prompt history.
 
     Returns:
         dict: A dictionary containing the image data formatted for OpenAI.
     """
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    image = encode_image(image)
     # Return the image content for OpenAI
     return {
         "type": "image_url",
-        "image_url": {"url": f"data:image/png;base64,{base64_image}"},
+        "image_url": {"url": f"data:{image.media_type};base64,{image.base64}"},
     }
 
 
@@ -112,21 +294,32 @@ def process_image_claude(image):
     """Process an image for Anthropic's Claude API by converting it to base64.
 
     Args:
-        image: The image to process.
+        image: The image to process, a PIL image or an `EncodedImage` from the prompt history.
 
     Returns:
         dict: A dictionary containing the image data formatted for Claude.
     """
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    image = encode_image(image)
     # Return the image content for Anthropic
     return {
         "type": "image",
-        "source": {"type": "base64", "media_type": "image/png", "data": base64_image},
+        "source": {"type": "base64", "media_type": image.media_type, "data": image.base64},
     }
 
 
+def process_image_gemini(image):
+    """Process an image for the Generative AI API as an inline PNG blob.
+
+    Args:
+        image: The image to process, a PIL image or an `EncodedImage` from the prompt history.
+
+    Returns:
+        dict: A dictionary containing the image data formatted for Gemini.
+    """
+    image = encode_image(image)
+    return {"mime_type": image.media_type, "data": image.png}
+
+
 class OpenAIWrapper(LLMClientWrapper):
     """Wrapper for interacting with the OpenAI API."""
 
@@ -168,6 +361,17 @@ class OpenAIWrapper(LLMClientWrapper):
                 converted_messages.append({"role": msg.role, "content": new_content})
         return converted_messages
 
+    def record_usage(self, response, latency):
+        """Record the usage of an OpenAI response, including prompt tokens served from the cache."""
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        return self.ledger.record(
+            self.model_id,
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens,
+            latency,
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        )
+
     def generate(self, messages):
         """Generate a response from the OpenAI API given a list of messages.
 
@@ -188,14 +392,98 @@ class OpenAIWrapper(LLMClientWrapper):
                 max_tokens=self.client_kwargs.get("max_tokens", 1024),
             )
 
+        start = time.perf_counter()
         response = self.execute_with_retries(api_call)
+        usage = self.record_usage(response, time.perf_counter() - start)
 
         return LLMResponse(
             model_id=self.model_id,
             completion=response.choices[0].message.content.strip(),
             stop_reason=response.choices[0].finish_reason,
-            input_tokens=response.usage.prompt_tokens,
-            output_tokens=response.usage.completion_tokens,
+            input_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+            reasoning=None,
+        )
+
+    def generate_with_tools(self, messages, tools, tool_handler, max_tool_rounds=1):
+        """Generate a response from the OpenAI API, running the function calls it requests.
+
+        Args:
+            messages (list): A list of message objects.
+            tools (list): Tool specifications with a `name`, a `description` and JSON schema `parameters`.
+            tool_handler (callable): Called as `tool_handler(name, arguments)`; returns the tool result as a string.
+            max_tool_rounds (int, optional): Maximum number of rounds of tool calls. Defaults to 1.
+
+        Returns:
+            LLMResponse: The final response from the OpenAI API.
+        """
+        self._initialize_client()
+        converted_messages = self.convert_messages(messages)
+        openai_tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "parameters": tool["parameters"],
+                },
+            }
+            for tool in tools
+        ]
+
+        input_tokens = output_tokens = 0
+        for tool_round in range(max_tool_rounds + 1):
+            # After the last round of tool calls the model has to answer
+            tool_choice = "auto" if tool_round < max_tool_rounds else "none"
+
+            def api_call():
+                return self.client.chat.completions.create(
+                    messages=converted_messages,
+                    model=self.model_id,
+                    temperature=self.client_kwargs.get("temperature", 0.5),
+                    max_tokens=self.client_kwargs.get("max_tokens", 1024),
+                    tools=openai_tools,
+                    tool_choice=tool_choice,
+                )
+
+            start = time.perf_counter()
+            response = self.execute_with_retries(api_call)
+            usage = self.record_usage(response, time.perf_counter() - start)
+            input_tokens += usage["input_tokens"]
+            output_tokens += usage["output_tokens"]
+
+            message = response.choices[0].message
+            if not message.tool_calls:
+                break
+            converted_messages.append(
+                {
+                    "role": "assistant",
+                    "content": message.content,
+                    "tool_calls": [
+                        {
+                            "id": call.id,
+                            "type": "function",
+                            "function": {"name": call.function.name, "arguments": call.function.arguments},
+                        }
+                        for call in message.tool_calls
+                    ],
+                }
+            )
+            for call in message.tool_calls:
+                converted_messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": call.id,
+                        "content": self.run_tool(tool_handler, call.function.name, call.function.arguments),
+                    }
+                )
+
+        return LLMResponse(
+            model_id=self.model_id,
+            completion=(message.content or "").strip(),
+            stop_reason=response.choices[0].finish_reason,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
             reasoning=None,
         )
 
@@ -246,7 +534,7 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
             if msg.content:
                 parts.append(msg.content)
             if msg.attachment is not None:
-                parts.append(msg.attachment)
+                parts.append(process_image_gemini(msg.attachment))
             converted_messages.append(
                 {
                     "role": role,
@@ -314,6 +602,17 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
         text = getattr(content_parts[0], "text", "")
         return text.strip()
 
+    def record_usage(self, response, latency):
+        """Record the usage of a Gemini response, including prompt tokens served from the context cache."""
+        usage = getattr(response, "usage_metadata", None)
+        return self.ledger.record(
+            self.model_id,
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0,
+            latency,
+            cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0,
+        )
+
     def generate(self, messages):
         """Generate a response from the Generative AI API given a list of messages.
 
@@ -333,7 +632,9 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
                 generation_config=self.generation_config,
             )
 
+        start = time.perf_counter()
         response = self.execute_with_retries(api_call)
+        usage = self.record_usage(response, time.perf_counter() - start)
 
         completion = self.extract_completion(response)
 
@@ -345,16 +646,80 @@ class GoogleGenerativeAIWrapper(LLMClientWrapper):
                 if response and getattr(response, "candidates", [])
                 else "unknown"
             ),
-            input_tokens=(
-                getattr(response.usage_metadata, "prompt_token_count", 0)
-                if response and getattr(response, "usage_metadata", None)
-                else 0
-            ),
-            output_tokens=(
-                getattr(response.usage_metadata, "candidates_token_count", 0)
-                if response and getattr(response, "usage_metadata", None)
-                else 0
-            ),
+            input_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+            reasoning=None,
+        )
+
+    def generate_with_tools(self, messages, tools, tool_handler, max_tool_rounds=1):
+        """Generate a response from the Generative AI API, running the function calls it requests.
+
+        Args:
+            messages (list): A list of message objects.
+            tools (list): Tool specifications with a `name`, a `description` and JSON schema `parameters`.
+            tool_handler (callable): Called as `tool_handler(name, arguments)`; returns the tool result as a string.
+            max_tool_rounds (int, optional): Maximum number of rounds of tool calls. Defaults to 1.
+
+        Returns:
+            LLMResponse: The final response from the Generative AI API.
+        """
+        self._initialize_client()
+        converted_messages = self.convert_messages(messages)
+        gemini_tools = [
+            {
+                "function_declarations": [
+                    {"name": tool["name"], "description": tool["description"], "parameters": tool["parameters"]}
+                    for tool in tools
+                ]
+            }
+        ]
+
+        input_tokens = output_tokens = 0
+        for tool_round in range(max_tool_rounds + 1):
+            # After the last round of tool calls the model has to answer
+            mode = "AUTO" if tool_round < max_tool_rounds else "NONE"
+
+            def api_call():
+                return self.model.generate_content(
+                    converted_messages,
+                    generation_config=self.generation_config,
+                    tools=gemini_tools,
+                    tool_config={"function_calling_config": {"mode": mode}},
+                )
+
+            start = time.perf_counter()
+            response = self.execute_with_retries(api_call)
+            usage = self.record_usage(response, time.perf_counter() - start)
+            input_tokens += usage["input_tokens"]
+            output_tokens += usage["output_tokens"]
+
+            candidates = getattr(response, "candidates", [])
+            parts = list(candidates[0].content.parts) if candidates else []
+            calls = [part.function_call for part in parts if part.function_call and part.function_call.name]
+            if not calls:
+                break
+            converted_messages.append(candidates[0].content)
+            converted_messages.append(
+                {
+                    "role": "user",
+                    "parts": [
+                        {
+                            "function_response": {
+                                "name": call.name,
+                                "response": {"result": self.run_tool(tool_handler, call.name, dict(call.args))},
+                            }
+                        }
+                        for call in calls
+                    ],
+                }
+            )
+
+        return LLMResponse(
+            model_id=self.model_id,
+            completion="".join(part.text for part in parts if part.text).strip(),
+            stop_reason=getattr(candidates[0], "finish_reason", "unknown") if candidates else "unknown",
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
             reasoning=None,
         )
 
@@ -388,16 +753,37 @@ class ClaudeWrapper(LLMClientWrapper):
         """
         converted_messages = []
         for msg in messages:
-            converted_messages.append({"role": msg.role, "content": [{"type": "text", "text": msg.content}]})
-            if converted_messages[-1]["role"] == "system":
+            content = [{"type": "text", "text": msg.content}]
+            if msg.attachment is not None:
+                content.append(process_image_claude(msg.attachment))
+            if msg.cache_prefix:
+                # Cache breakpoint: the prompt up to here is written to and read from the prompt cache
+                content[-1]["cache_control"] = {"type": "ephemeral"}
+            converted_messages.append({"role": msg.role, "content": content})
+            if msg.role == "system":
                 # Claude doesn't support system prompt and requires alternating roles
                 converted_messages[-1]["role"] = "user"
                 converted_messages.append({"role": "assistant", "content": "I'm ready!"})
-            if msg.attachment is not None:
-                converted_messages[-1]["content"].append(process_image_claude(msg.attachment))
 
         return converted_messages
 
+    def record_usage(self, response, latency):
+        """Record the usage of a Claude response.
+
+        Claude reports prompt tokens read from and written to the prompt cache separately from
+        `input_tokens`, so they are added to get the full prompt size.
+        """
+        cached_tokens = getattr(response.usage, "cache_read_input_tokens", 0) or 0
+        cache_write_tokens = getattr(response.usage, "cache_creation_input_tokens", 0) or 0
+        return self.ledger.record(
+            self.model_id,
+            response.usage.input_tokens + cached_tokens + cache_write_tokens,
+            response.usage.output_tokens,
+            latency,
+            cached_tokens=cached_tokens,
+            cache_write_tokens=cache_write_tokens,
+        )
+
     def generate(self, messages):
         """Generate a response from the Claude API given a list of messages.
 
@@ -418,14 +804,96 @@ class ClaudeWrapper(LLMClientWrapper):
                 max_tokens=self.client_kwargs.get("max_tokens", 1024),
             )
 
+        start = time.perf_counter()
         response = self.execute_with_retries(api_call)
+        usage = self.record_usage(response, time.perf_counter() - start)
 
         return LLMResponse(
             model_id=self.model_id,
             completion=response.content[0].text.strip(),
             stop_reason=response.stop_reason,
-            input_tokens=response.usage.input_tokens,
-            output_tokens=response.usage.output_tokens,
+            input_tokens=usage["input_tokens"],
+            output_tokens=usage["output_tokens"],
+            reasoning=None,
+        )
+
+    def generate_with_tools(self, messages, tools, tool_handler, max_tool_rounds=1):
+        """Generate a response from the Claude API, running the tools it uses.
+
+        Args:
+            messages (list): A list of message objects.
+            tools (list): Tool specifications with a `name`, a `description` and JSON schema `parameters`.
+            tool_handler (callable): Called as `tool_handler(name, arguments)`; returns the tool result as a string.
+            max_tool_rounds (int, optional): Maximum number of rounds of tool calls. Defaults to 1.
+
+        Returns:
+            LLMResponse: The final response from the Claude API.
+        """
+        self._initialize_client()
+        converted_messages = self.convert_messages(messages)
+        claude_tools = [
+            {"name": tool["name"], "description": tool["description"], "input_schema": tool["parameters"]}
+            for tool in tools
+        ]
+
+        input_tokens = output_tokens = 0
+        for tool_round in range(max_tool_rounds + 1):
+            # After the last round of tool calls the model has to answer
+            tool_choice = {"type": "auto"} if tool_round < max_tool_rounds else {"type": "none"}
+
+            def api_call():
+                return self.client.messages.create(
+                    messages=converted_messages,
+                    model=self.model_id,
+                    temperature=self.client_kwargs.get("temperature", 0.5),
+                    max_tokens=self.client_kwargs.get("max_tokens", 1024),
+                    tools=claude_tools,
+                    tool_choice=tool_choice,
+                )
+
+            start = time.perf_counter()
+            response = self.execute_with_retries(api_call)
+            usage = self.record_usage(response, time.perf_counter() - start)
+            input_tokens += usage["input_tokens"]
+            output_tokens += usage["output_tokens"]
+
+            tool_uses = [block for block in response.content if block.type == "tool_use"]
+            if not tool_uses:
+                break
+            converted_messages.append(
+                {
+                    "role": "assistant",
+                    "content": [
+                        (
+                            {"type": "tool_use", "id": block.id, "name": block.name, "input": block.input}
+                            if block.type == "tool_use"
+                            else {"type": "text", "text": block.text}
+                        )
+                        for block in response.content
+                        if block.type in ["text", "tool_use"]
+                    ],
+                }
+            )
+            converted_messages.append(
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "tool_result",
+                            "tool_use_id": block.id,
+                            "content": self.run_tool(tool_handler, block.name, block.input),
+                        }
+                        for block in tool_uses
+                    ],
+                }
+            )
+
+        return LLMResponse(
+            model_id=self.model_id,
+            completion="".join(block.text for block in response.content if block.type == "text").strip(),
+            stop_reason=response.stop_reason,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
             reasoning=None,
         )
 
@@ -442,6 +910,11 @@ def create_llm_client(client_config):
     """
 
     def client_factory():
+        if client_config.get("cascade") and client_config.cascade.model_id:
+            from balrog.cascade import CascadeClient
+
+            return CascadeClient.from_config(client_config)
+
         client_name_lower = client_config.client_name.lower()
         if "openai" in client_name_lower or "vllm" in client_name_lower:
             return OpenAIWrapper(client_config)
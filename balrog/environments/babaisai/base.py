@@ -1,11 +1,11 @@
-from collections import defaultdict
-
 import baba
 import gym
 import numpy as np
 from baba.world_object import name_mapping
 from PIL import Image
 
+from balrog.environments.observation import LazyObservation
+
 BABAISAI_ACTION_SPACE = [a.name for a in baba.grid.BabaIsYouEnv.Actions]
 
 
@@ -154,13 +154,10 @@ class BabaIsAIWrapper(gym.Wrapper):
             prompt += f"Active rules:\n{ruleset}\n\n"
         prompt += f"Objects on the map:\n{text_observation}"
 
-        obs = defaultdict(lambda: None)
-
-        obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
-        image = Image.fromarray(self.env.render(mode="rgb_array")).convert("RGB")
-        obs["image"] = image
-
-        return obs
+        return LazyObservation(
+            {"text": {"long_term_context": prompt, "short_term_context": ""}},
+            image=lambda: Image.fromarray(self.env.render(mode="rgb_array")).convert("RGB"),
+        )
 
     def reset(self, **kwargs):
         obs = self.env.reset(**kwargs)
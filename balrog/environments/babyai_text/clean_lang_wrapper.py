@@ -1,6 +1,8 @@
 import gymnasium as gym
 from PIL import Image
 
+from balrog.environments.observation import LazyObservation
+
 BABYAI_ACTION_SPACE = [
     "turn left",
     "turn right",
@@ -34,35 +36,34 @@ class BabyAITextCleanLangWrapper(gym.Wrapper):
         return self.language_action_space[action.value]
 
     def get_prompt(self, obs, infos):
-        image = Image.fromarray(self.env.unwrapped.get_pov_render(tile_size=16)).convert("RGB")
-
         def _form_prompt(description):
             return "\n".join([d.replace("You see ", "") for d in description])
 
-        prompt = _form_prompt(infos["descriptions"])
-        return prompt, image
+        return _form_prompt(infos["descriptions"])
+
+    def get_image(self):
+        """Render the agent's point of view, on first access to the observation image."""
+        return Image.fromarray(self.env.unwrapped.get_pov_render(tile_size=16)).convert("RGB")
 
     def reset(self, **kwargs):
         obs, info = self.env.reset(**kwargs)
-        prompt, image = self.get_prompt(obs, info)
+        prompt = self.get_prompt(obs, info)
         self._mission = obs["mission"]
         self.progression = 0.0
         # Following the convention from NetHack Language Wrapper for specifying
         # short term vs long term context here. There is no equivalent long term
         # context like e.g. inventory in BabyAI-Text.
         obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
-        obs["image"] = image
-        return obs, info
+        return LazyObservation(obs, image=self.get_image), info
 
     def step(self, action):
         action_int = self.language_action_space.index(action)
         obs, reward, terminated, truncated, infos = self.env.step(action_int)
         if reward > 0:
             self.progression = 1.0
-        prompt, image = self.get_prompt(obs, infos)
+        prompt = self.get_prompt(obs, infos)
         obs["text"] = {"long_term_context": prompt, "short_term_context": ""}
-        obs["image"] = image
-        return obs, reward, terminated, truncated, infos
+        return LazyObservation(obs, image=self.get_image), reward, terminated, truncated, infos
 
     def get_stats(self):
         # No special stats tracking implemented for now
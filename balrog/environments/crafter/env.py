@@ -6,6 +6,7 @@ import numpy as np
 from PIL import Image
 
 from balrog.environments import Strings
+from balrog.environments.observation import LazyObservation
 
 ACTIONS = [
     "Noop",
@@ -231,17 +232,18 @@ class CrafterLanguageWrapper(gym.Wrapper):
         return obs, reward, done, info
 
     def process_obs(self, obs, info):
-        img = Image.fromarray(self.env.render()).convert("RGB")
-        long_term_context, short_term_context = describe_frame(info)
-
-        return {
-            "text": {
+        def text():
+            long_term_context, short_term_context = describe_frame(info)
+            return {
                 "long_term_context": long_term_context,
                 "short_term_context": short_term_context,
-            },
-            "image": img,
-            "obs": obs,
-        }
+            }
+
+        return LazyObservation(
+            {"obs": obs},
+            text=text,
+            image=lambda: Image.fromarray(self.env.render()).convert("RGB"),
+        )
 
     def update_progress(self, info):
         self.score_tracker = 0 + sum([1.0 for k, v in info["achievements"].items() if v > 0])
@@ -1,11 +1,16 @@
 import gymnasium as gym
 
+from balrog.environments.observation import LazyObservation
+
 
 class EnvWrapper(gym.Wrapper):
     """
     A wrapper class for gym environments to standardize interactions across different environments.
     It provides additional functionalities, such as handling specific observation processing,
     managing action validity, retrieving instruction prompts, and tracking failed action candidates.
+
+    Observations may be `LazyObservation`s. Before the environment moves on, the previous
+    observation is expired, so that its unread fields are not computed from the new state.
     """
 
     def __init__(self, env, env_name, task_name):
@@ -13,16 +18,19 @@ class EnvWrapper(gym.Wrapper):
         self.env_name = env_name
         self.task_name = task_name
         self.failed_candidates = []
+        self._last_observation = None
 
     @property
     def max_steps(self):
         return self.env.max_steps
 
     def reset(self, **kwargs):
+        self._expire_last_observation()
         obs, info = self.env.reset(**kwargs)
         return self._process_observation(obs), info
 
     def step(self, action):
+        self._expire_last_observation()
         obs, reward, terminated, truncated, info = self.env.step(action)
         processed_obs = self._process_observation(obs)
         return processed_obs, reward, terminated, truncated, info
@@ -41,8 +49,13 @@ class EnvWrapper(gym.Wrapper):
         else:
             raise ValueError(f"Unknown environment: {self.env_name}")
 
+        self._last_observation = obs
         return obs
 
+    def _expire_last_observation(self):
+        if isinstance(self._last_observation, LazyObservation):
+            self._last_observation.expire()
+
     @property
     def actions(self):
         # This property should return the list of available actions
@@ -1,11 +1,14 @@
 import random
+from functools import partial
 
+import numpy as np
 from nle import nle_language_obsv
 from nle.language_wrapper.wrappers import nle_language_wrapper as language_wrapper
 from nle.nethack import USEFUL_ACTIONS
 from PIL import Image
 
 from balrog.environments import Strings
+from balrog.environments.observation import LazyObservation
 
 from ..minihack import ACTIONS as MINIHACK_ACTIONS
 from .progress import get_progress_system
@@ -59,14 +62,16 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         return NLELanguageWrapper.all_nle_action_map[self.env.actions[action]][0]
 
     def nle_process_obsv(self, nle_obsv):
-        img = Image.fromarray(self.render("tiles")).convert("RGB") if self.vlm else None
-        text = self.nle_obsv_type(nle_obsv)
+        values, factories = {"obs": nle_obsv}, {}
+        if self.vlm:
+            # The tiles are rendered from a copy, before the observation arrays are updated in place
+            glyphs = np.copy(self.env.last_observation[self.env._observation_keys.index("glyphs")])
+            factories["image"] = partial(tiles_image, glyphs)
+        else:
+            values["image"] = None
+        values["text"] = self.nle_obsv_type(nle_obsv)
 
-        return {
-            "text": text,
-            "image": img,
-            "obs": nle_obsv,
-        }
+        return LazyObservation(values, **factories)
 
     def nle_obsv_type(self, nle_obsv):
         nle_obsv = self.nle_obsv_to_language(nle_obsv)
@@ -133,84 +138,108 @@ class NLELanguageWrapper(language_wrapper.NLELanguageWrapper):
         return Strings(all_actions)
 
     def ascii_render(self, chars):
-        rows, cols = chars.shape
-        result = ""
-        for i in range(rows):
-            for j in range(cols):
-                entry = chr(chars[i, j])
-                result += entry
-            result += "\n"
-        return result
+        """Render a grid of character codes as text, each row followed by a newline.
+
+        The rows are laid out with their newlines in one byte buffer and decoded at once.
+        Latin-1 maps every byte to the character with the same code, as `chr` does.
+        """
+        rows = chars.shape[0]
+        lines = np.empty((rows, chars.shape[1] + 1), dtype=np.uint8)
+        lines[:, :-1] = chars
+        lines[:, -1] = ord("\n")
+        return lines.tobytes().decode("latin-1")
 
     def nle_obsv_to_language(self, nle_obsv):
         """Translate NLE Observation into a language observation.
+
+        The message is read right away, since skipping "--More--" steps the environment. The
+        other fields are computed on first access, from copies of the observation arrays, which
+        NLE updates in place at every step.
+
         Args:
             nle_obsv (dict): NLE observation from the base environment
         Returns:
-            (dict): language observation
+            (LazyObservation): language observation
         """
 
         message, nle_obsv = self.clean_message(nle_obsv)
 
-        glyphs = nle_obsv["glyphs"]
-        blstats = nle_obsv["blstats"]
-        tty_cursor = nle_obsv["tty_cursor"]
-        inv_strs = nle_obsv["inv_strs"]
-        inv_letters = nle_obsv["inv_letters"]
-
-        return {
-            "text_glyphs": self.nle_language.text_glyphs(glyphs, blstats).decode("latin-1"),
-            "text_message": message,
-            "text_blstats": self.nle_language.text_blstats(blstats).decode("latin-1"),
-            "text_inventory": self.nle_language.text_inventory(inv_strs, inv_letters).decode("latin-1"),
-            "text_cursor": self.nle_language.text_cursor(glyphs, blstats, tty_cursor).decode("latin-1"),
-            "tty_chars": nle_obsv["tty_chars"],
-            "tty_cursor": nle_obsv["tty_cursor"],
-        }
+        glyphs = np.copy(nle_obsv["glyphs"])
+        blstats = np.copy(nle_obsv["blstats"])
+        tty_cursor = np.copy(nle_obsv["tty_cursor"])
+        inv_strs = np.copy(nle_obsv["inv_strs"])
+        inv_letters = np.copy(nle_obsv["inv_letters"])
+        language = self.nle_language
+
+        return LazyObservation(
+            {
+                "text_message": message,
+                "tty_chars": np.copy(nle_obsv["tty_chars"]),
+                "tty_cursor": tty_cursor,
+            },
+            text_glyphs=lambda: language.text_glyphs(glyphs, blstats).decode("latin-1"),
+            text_blstats=lambda: language.text_blstats(blstats).decode("latin-1"),
+            text_inventory=lambda: language.text_inventory(inv_strs, inv_letters).decode("latin-1"),
+            text_cursor=lambda: language.text_cursor(glyphs, blstats, tty_cursor).decode("latin-1"),
+        )
 
     def render_text(self, nle_obsv):
-        long_term_observations = [
-            ("text_message", "message"),
-            ("text_glyphs", "language observation"),
-            ("text_cursor", "cursor"),
-        ]
-
-        short_term_observations = [
-            ("text_blstats", "statistics"),
-            ("text_inventory", "inventory"),
-        ]
+        def long_term_context():
+            long_term_observations = [
+                ("message", nle_obsv["text_message"]),
+                ("language observation", nle_obsv["text_glyphs"]),
+                ("cursor", nle_obsv["text_cursor"]),
+            ]
+            return render_sections(long_term_observations)
 
-        long_term_context = "\n".join([f"{name}:\n{nle_obsv[key]}\n" for key, name in long_term_observations])
-        short_term_context = "\n".join([f"{name}:\n{nle_obsv[key]}\n" for key, name in short_term_observations])
+        def short_term_context():
+            short_term_observations = [
+                ("statistics", nle_obsv["text_blstats"]),
+                ("inventory", nle_obsv["text_inventory"]),
+            ]
+            return render_sections(short_term_observations)
 
-        return {
-            "long_term_context": long_term_context,
-            "short_term_context": short_term_context,
-        }
+        return LazyObservation(long_term_context=long_term_context, short_term_context=short_term_context)
 
     def render_hybrid(self, nle_obsv):
-        ascii_map = self.ascii_render(nle_obsv["tty_chars"])
-        cursor = nle_obsv["tty_cursor"]
-        cursor = f"(x={cursor[1]}, y={cursor[0]})"
-        ascii_map = "\n".join(ascii_map.split("\n")[1:])  # remove first line
-
-        nle_obsv["map"] = ascii_map
-        nle_obsv["text_cursor"] = nle_obsv["text_cursor"] + "\n" + cursor
-
-        long_term_observations = [
-            ("text_message", "message"),
-            ("text_glyphs", "language observation"),
-            ("text_cursor", "cursor"),
-            ("map", "map"),
-        ]
-        short_term_observation = [
-            ("text_inventory", "inventory"),
-        ]
-
-        long_term_context = "\n".join([f"{name}:\n{nle_obsv[key]}\n" for key, name in long_term_observations])
-        short_term_context = "\n".join([f"{name}:\n{nle_obsv[key]}\n" for key, name in short_term_observation])
-
-        return {
-            "long_term_context": long_term_context,
-            "short_term_context": short_term_context,
-        }
+        def long_term_context():
+            cursor = nle_obsv["tty_cursor"]
+            cursor = f"(x={cursor[1]}, y={cursor[0]})"
+            long_term_observations = [
+                ("message", nle_obsv["text_message"]),
+                ("language observation", nle_obsv["text_glyphs"]),
+                ("cursor", nle_obsv["text_cursor"] + "\n" + cursor),
+                ("map", text["map"]),
+            ]
+            return render_sections(long_term_observations)
+
+        def short_term_context():
+            short_term_observation = [
+                ("inventory", nle_obsv["text_inventory"]),
+            ]
+            return render_sections(short_term_observation)
+
+        text = LazyObservation(
+            long_term_context=long_term_context,
+            short_term_context=short_term_context,
+            # Without the message line. Also in long_term_context; lets the prompt builder encode map changes
+            map=lambda: self.ascii_render(nle_obsv["tty_chars"][1:]),
+        )
+        return text
+
+
+def render_sections(observations):
+    """Join the fields of a language observation into named sections.
+
+    Args:
+        observations (list): Pairs of the section name and its text, in order.
+
+    Returns:
+        str: The sections, e.g. "message:\nHello Agent\n".
+    """
+    return "\n".join([f"{name}:\n{text}\n" for name, text in observations])
+
+
+def tiles_image(glyphs):
+    """Render the map glyphs with the NetHack tiles."""
+    return Image.fromarray(rgb_render_image(glyphs)).convert("RGB")
@@ -6,6 +6,35 @@ from typing import Optional
 with open(os.path.join(os.path.dirname(__file__), "achievements.json"), "r") as f:
     ACHIEVEMENTS = json.load(f)
 
+# see: https://arxiv.org/pdf/2006.13760#page=16
+BLSTATS_NAMES = [
+    "x_pos",
+    "y_pos",
+    "strength_percentage",
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+    "score",
+    "hitpoints",
+    "max_hitpoints",
+    "depth",
+    "gold",
+    "energy",
+    "max_energy",
+    "armor_class",
+    "monster_level",
+    "experience_level",
+    "experience_points",
+    "time",
+    "hunger_state",
+    "carrying_capacity",
+    "dungeon_number",
+    "level_number",
+]
+
 
 def get_progress_system(env):
     if "NetHackChallenge" in env.spec.id:
@@ -42,7 +71,7 @@ class Progress:
         stats = self._update_stats(nle_obsv["blstats"])
 
         if done:
-            tty_chars = bytes(nle_obsv["tty_chars"].reshape(-1)).decode(errors="ignore")
+            tty_chars = nle_obsv["tty_chars"].tobytes().decode(errors="ignore")
             self.end_reason = self._get_end_reason(tty_chars, info["end_status"])
 
         xp = self._get_xp(stats)
@@ -60,35 +89,7 @@ class Progress:
                 self.highest_achievement = dlvl
 
     def _update_stats(self, blstats):
-        # see: https://arxiv.org/pdf/2006.13760#page=16
-        stats_names = [
-            "x_pos",
-            "y_pos",
-            "strength_percentage",
-            "strength",
-            "dexterity",
-            "constitution",
-            "intelligence",
-            "wisdom",
-            "charisma",
-            "score",
-            "hitpoints",
-            "max_hitpoints",
-            "depth",
-            "gold",
-            "energy",
-            "max_energy",
-            "armor_class",
-            "monster_level",
-            "experience_level",
-            "experience_points",
-            "time",
-            "hunger_state",
-            "carrying_capacity",
-            "dungeon_number",
-            "level_number",
-        ]
-        stats = {name: value for name, value in zip(stats_names, blstats)}
+        stats = {name: value for name, value in zip(BLSTATS_NAMES, blstats.tolist())}
 
         self.score = int(stats["score"])
         self.depth = int(stats["depth"])
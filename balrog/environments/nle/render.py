@@ -1,9 +1,21 @@
+import functools
+import hashlib
+import logging
 import os
+import tempfile
 
 import numpy as np
+import PIL
 from nle.language_wrapper.wrappers.nle_language_wrapper import NLELanguageWrapper
 from PIL import Image, ImageDraw, ImageFont
 
+logger = logging.getLogger(__name__)
+
+FONT_PATH = os.path.join(os.path.dirname(__file__), "Hack-Regular.ttf")
+FONT_SIZE = 12
+# Rasterized atlases are cached here, override with the BALROG_CACHE_DIR environment variable
+CACHE_DIR = os.environ.get("BALROG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "balrog"))
+
 MAX_ACTION_LENGTH = max(
     [len(action_strs[0]) for action, action_strs in NLELanguageWrapper.all_nle_action_map.items()]
     + [
@@ -12,7 +24,7 @@ MAX_ACTION_LENGTH = max(
 )
 
 
-def create_texture_map():
+def create_texture_map(font_path=FONT_PATH, font_size=FONT_SIZE):
     COLORS = [
         "#000000",
         "#800000",
@@ -34,8 +46,7 @@ def create_texture_map():
 
     # Load a font (using default font here)
     dummy_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-    path = os.path.join(os.path.dirname(__file__), "Hack-Regular.ttf")
-    font = ImageFont.truetype(path, 12)
+    font = ImageFont.truetype(font_path, font_size)
     cell_width, cell_height = map(
         max,
         zip(*[dummy_draw.textbbox((0, 0), text=chr(i), font=font)[2:] for i in range(256)]),
@@ -71,8 +82,8 @@ def create_texture_map():
     return img
 
 
-def make_atlas():
-    image = np.array(create_texture_map())
+def make_atlas(font_path=FONT_PATH, font_size=FONT_SIZE):
+    image = np.array(create_texture_map(font_path, font_size))
     cell_height = image.shape[0] // 64
     cell_width = image.shape[1] // 64
     texture_atlas = (
@@ -89,12 +100,62 @@ def make_atlas():
     # plt.imsave("new_image.png", new_image)
 
 
-DEFAULT_TEXTURE_ATLAS = make_atlas()
+def atlas_cache_path(font_path=FONT_PATH, font_size=FONT_SIZE):
+    """Return the cache file of the atlas, keyed by the font file, its size and the Pillow version."""
+    digest = hashlib.sha256()
+    with open(font_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{font_size}:{PIL.__version__}".encode())
+    return os.path.join(CACHE_DIR, f"tty_atlas_{digest.hexdigest()[:16]}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def load_atlas(font_path=FONT_PATH, font_size=FONT_SIZE):
+    """Load the atlas of the 4,096 colored characters of the TTY, rasterizing it on first use.
+
+    The atlas is rasterized once per font and cached on disk. The cached file is
+    memory-mapped, so processes share its pages.
+
+    Returns:
+        np.ndarray: Array of shape (4096, cell height, cell width, 3), indexed by color * 256 + character.
+    """
+    path = atlas_cache_path(font_path, font_size)
+    if os.path.exists(path):
+        try:
+            texture_atlas = np.load(path, mmap_mode="r")
+            if texture_atlas.ndim == 4 and texture_atlas.shape[0] == 4096:
+                return texture_atlas
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the cached TTY font atlas {path}: {e}")
+        logger.warning(f"Rebuilding the cached TTY font atlas {path}")
+
+    texture_atlas = make_atlas(font_path, font_size)
+    temp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Written to a temporary file first, so that parallel workers never read a partial atlas
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".npy", delete=False) as f:
+            temp_path = f.name
+            np.save(f, texture_atlas)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.error(f"Could not cache the TTY font atlas in {CACHE_DIR}, using it from memory: {e}")
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        return texture_atlas
+    return np.load(path, mmap_mode="r")
+
+
+def __getattr__(name):
+    # `DEFAULT_TEXTURE_ATLAS` used to be rasterized at import time
+    if name == "DEFAULT_TEXTURE_ATLAS":
+        return load_atlas()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def tty_render_image(tty_chars, tty_colors, tty_cursor=None, *, texture_atlas=None):
     if texture_atlas is None:
-        texture_atlas = DEFAULT_TEXTURE_ATLAS
+        texture_atlas = load_atlas()
     tty_colors_masked = (
         tty_colors & 15
     )  # I don't know why sometimes color > 15 but this is effectively what the ASCII renderers do
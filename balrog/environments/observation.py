@@ -0,0 +1,75 @@
+from collections.abc import MutableMapping
+
+
+class LazyObservation(MutableMapping):
+    """An observation whose fields are computed on first access and memoized.
+
+    Environment wrappers give each text or image field as a function, so the cost of a step
+    depends only on the fields the agent reads. Fields computed from the live environment
+    state are only valid until the next step: `EnvWrapper` calls `expire` on the previous
+    observation before stepping, after which its unread fields can no longer be computed.
+
+    Example:
+        obs = LazyObservation({"obs": raw}, image=lambda: render(raw))
+    """
+
+    def __init__(self, values=None, **factories):
+        """Initialize the observation.
+
+        Args:
+            values (dict, optional): Fields that are already computed.
+            **factories: Functions without arguments that compute the remaining fields.
+        """
+        self._values = dict(values or {})
+        self._factories = factories
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            # KeyError for unknown fields, like a dict. The factory is kept until it succeeds, so a
+            # failed read raises again instead of the field disappearing.
+            self._values[key] = self._factories[key]()
+            del self._factories[key]
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._factories.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if key in self._factories:
+            del self._factories[key]
+        else:
+            del self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values or key in self._factories
+
+    def __iter__(self):
+        yield from list(self._values)
+        yield from list(self._factories)
+
+    def __len__(self):
+        return len(self._values) + len(self._factories)
+
+    def __reduce__(self):
+        # Functions do not pickle, so all the fields are computed when the observation is sent to another process
+        return (LazyObservation, (dict(self),))
+
+    def __repr__(self):
+        return f"LazyObservation(computed={list(self._values)}, pending={list(self._factories)})"
+
+    def expire(self):
+        """Make the unread fields unavailable, once the environment has moved on.
+
+        Fields that were already read stay available. Nested observations are left as they are,
+        so their fields must only depend on copies of the state they were made from.
+        """
+        for key in self._factories:
+            self._factories[key] = _expired(key)
+
+
+def _expired(key):
+    def factory():
+        raise RuntimeError(f"The observation field {key!r} was not read before the environment stepped")
+
+    return factory
@@ -15,8 +15,11 @@ from omegaconf import OmegaConf
 from tqdm import tqdm
 
 from balrog.agents.few_shot import FewShotAgent
+from balrog.budget import EpisodeBudget, RunBudget
+from balrog.cascade import CascadeClient
 from balrog.dataset import InContextDataset
 from balrog.environments import make_env
+from balrog.retrieval import RetrievalServer, connect_retriever
 from balrog.utils import get_unique_seed
 
 logger = logging.getLogger(__name__)
@@ -44,8 +47,12 @@ class EvaluatorManager:
         self.env_names = config.envs.names.split("-")
         self.env_evaluators = {}
         self.tasks = []
+        # Created before the workers are forked, so that they share the run's spending
+        self.run_budget = RunBudget(config.eval.budget)
         for env_name in self.env_names:
-            evaluator = Evaluator(env_name, config, original_cwd=original_cwd, output_dir=self.output_dir)
+            evaluator = Evaluator(
+                env_name, config, original_cwd=original_cwd, output_dir=self.output_dir, run_budget=self.run_budget
+            )
             self.env_evaluators[env_name] = evaluator
             for task in evaluator.tasks:
                 for episode_idx in range(evaluator.num_episodes):
@@ -90,6 +97,10 @@ class EvaluatorManager:
         total_episodes = len(self.tasks)
         with tqdm(total=total_episodes, desc="Evaluating Episodes", position=0) as pbar:
             for env_name, task, episode_idx in self.tasks:
+                budget_reason = self.run_budget.exhausted()
+                if budget_reason:
+                    logging.warning(f"Stopping the evaluation, {budget_reason}")
+                    break
                 evaluator = self.env_evaluators[env_name]
                 agent = agent_factory.create_agent()
                 episode_log = evaluator.run_episode(task, agent, position=1, episode_idx=episode_idx)
@@ -111,6 +122,12 @@ class EvaluatorManager:
 
         ctx = multiprocessing.get_context("fork")
 
+        # Optionally answer the wiki searches of all workers from one batching process
+        retrieval_server = None
+        if self.config.agent.rag_server:
+            retrieval_server = RetrievalServer(self.config, num_clients=self.num_workers, ctx=ctx)
+            retrieval_server.start()
+
         # Initially fill the task queue with tasks up to the number of workers
         for item in self.tasks[: self.num_workers]:
             task_queue.put(item)
@@ -126,7 +143,7 @@ class EvaluatorManager:
             position = positions[idx]
             p = ctx.Process(
                 target=self._worker,
-                args=(task_queue, results_queue, agent_factory, position),
+                args=(task_queue, results_queue, agent_factory, position, retrieval_server),
             )
             processes.append(p)
             p.start()
@@ -142,6 +159,8 @@ class EvaluatorManager:
             if "error" in result:
                 logging.error(f"Error in task {result['task']} processed by {result['process_num']}: {result['error']}")
                 logging.error(f"Traceback:\n{result['traceback']}")
+            elif "skipped" in result:
+                logging.warning(f"Skipped task {result['task']}, {result['skipped']}")
             else:
                 results[result["env_name"]].append(result)
             tasks_completed += 1
@@ -163,12 +182,15 @@ class EvaluatorManager:
         for p in processes:
             p.join()
 
+        if retrieval_server is not None:
+            retrieval_server.stop()
+
         # Close the master bar when done
         pbar.close()
 
         return results
 
-    def _worker(self, task_queue, results_queue, agent_factory, position):
+    def _worker(self, task_queue, results_queue, agent_factory, position, retrieval_server=None):
         """Worker process for parallel evaluation.
 
         Args:
@@ -176,11 +198,15 @@ class EvaluatorManager:
             results_queue (multiprocessing.Queue): Queue to put the results.
             agent_factory (AgentFactory): Factory object to create agents.
             position (int): Position index for the progress bar.
+            retrieval_server (RetrievalServer, optional): Shared retrieval server for RAG agents. Defaults to None.
         """
         seed = get_unique_seed(process_num=position)
         random.seed(seed)
         np.random.seed(seed)
 
+        if retrieval_server is not None:
+            connect_retriever(retrieval_server, position)
+
         agent = agent_factory.create_agent()
         process_num = multiprocessing.current_process().name
         while True:
@@ -189,6 +215,13 @@ class EvaluatorManager:
                 break
             try:
                 env_name, task, episode_idx = item
+                budget_reason = self.run_budget.exhausted()
+                if budget_reason:
+                    # Not saved, so that a resumed run plays the episode
+                    results_queue.put(
+                        {"env_name": env_name, "task": task, "skipped": budget_reason, "process_num": process_num}
+                    )
+                    continue
                 evaluator = self.env_evaluators[env_name]
                 result = evaluator.run_episode(
                     task,
@@ -221,7 +254,7 @@ class Evaluator:
     including loading in-context learning episodes and running episodes with the agent.
     """
 
-    def __init__(self, env_name, config, original_cwd="", output_dir="."):
+    def __init__(self, env_name, config, original_cwd="", output_dir=".", run_budget=None):
         """Initialize the Evaluator.
 
         Args:
@@ -229,10 +262,12 @@ class Evaluator:
             config (omegaconf.DictConfig): Configuration object containing evaluation settings.
             original_cwd (str, optional): Original current working directory. Defaults to "".
             output_dir (str, optional): Directory to save evaluation outputs. Defaults to ".".
+            run_budget (RunBudget, optional): Spending limits shared by all episodes of the run. Defaults to None.
         """
         self.env_name = env_name.strip()
         self.config = config
         self.output_dir = output_dir
+        self.run_budget = run_budget
         self.tasks = config.tasks[f"{self.env_name}_tasks"]
 
         self.num_episodes = config.eval.num_episodes[self.env_name]
@@ -256,6 +291,11 @@ class Evaluator:
         """
         env = make_env(self.env_name, task, self.config)
         agent.reset()
+        agent.client.ledger.reset()
+        budget = EpisodeBudget(self.config.eval.budget, self.run_budget)
+        cascade = agent.client if isinstance(agent.client, CascadeClient) else None
+        if cascade is not None:
+            cascade.reset()
 
         seed = self.config.envs.env_kwargs.seed
         if seed is None:
@@ -305,9 +345,18 @@ class Evaluator:
             )
 
             action = None
+            invalid_action = False
             for step in range(max_steps_per_episode):
-                response = agent.act(obs, prev_action=action)
+                if cascade is not None:
+                    progression = env.get_stats().get("progression")
+                    cascade.start_step(obs, invalid_action=invalid_action, progression=progression)
+                with agent.client.ledger.stage("act"):
+                    response = agent.act(obs, prev_action=action)
+                budget.update(agent.client.ledger.totals)
                 action = env.check_action_validity(response.completion)
+                invalid_action = action != response.completion
+                if invalid_action:
+                    agent.on_invalid_action(response.completion)
                 reasoning = response.reasoning if hasattr(response, "reasoning") else ""
 
                 episode_log["action_frequency"][action] += 1
@@ -320,12 +369,11 @@ class Evaluator:
                 episode_return += reward
 
                 # Give feedback on the action (if not valid)
-                obs["text"]["long_term_context"] = (
-                    f"\n\nYour previous output did not contain a valid action. Defaulted to action: {action}\n\nObservation:\n"
-                    + obs["text"]["long_term_context"]
-                    if (action != response.completion) and (self.config.eval.feedback_on_invalid_action)
-                    else obs["text"]["long_term_context"]
-                )
+                if (action != response.completion) and (self.config.eval.feedback_on_invalid_action):
+                    obs["text"]["long_term_context"] = (
+                        f"\n\nYour previous output did not contain a valid action. Defaulted to action: {action}\n\nObservation:\n"
+                        + obs["text"]["long_term_context"]
+                    )
                 action = response.completion
                 # Write the step data to the CSV file
                 csv_writer.writerow(
@@ -356,6 +404,16 @@ class Evaluator:
                     pbar.set_postfix_str("DONE")
                     break
 
+                budget_reason = budget.exhausted()
+                if budget_reason:
+                    logging.info(f"Episode stopped at step {step}, {budget_reason}")
+                    episode_log["budget_stop"] = budget_reason
+                    break
+                budget_reason = budget.running_low()
+                if budget_reason and "budget_degrade" not in episode_log and agent.degrade():
+                    logging.info(f"Agent degraded at step {step}, {budget_reason}")
+                    episode_log["budget_degrade"] = {"step": step, "reason": budget_reason}
+
             if pbar.n < pbar.total:
                 pbar.update(pbar.total - pbar.n)
             if "done" not in episode_log:
@@ -365,6 +423,14 @@ class Evaluator:
             episode_log["episode_return"] = episode_return
             episode_log["num_steps"] = step + 1
             episode_log["failed_candidates"] = env.failed_candidates
+            if hasattr(agent, "stage_stats"):
+                episode_log["stage_stats"] = copy.deepcopy(agent.stage_stats)
+            usage = agent.client.ledger.summary()
+            if usage["llm_calls"]:
+                # The ledger also counts calls whose responses the agent does not return, e.g. RAG queries
+                episode_log.update(usage)
+            if cascade is not None:
+                episode_log["cascade"] = cascade.summary()
             episode_log.update(env.get_stats())
             episode_log["process_num"] = process_num
             episode_log["seed"] = seed
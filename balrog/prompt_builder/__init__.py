@@ -1,4 +1,5 @@
 from .history import HistoryPromptBuilder
+from .memory import create_memory
 
 
 def create_prompt_builder(config):
@@ -13,6 +14,12 @@ def create_prompt_builder(config):
             - max_history (int): Maximum number of text history entries to retain.
             - max_image_history (int): Maximum number of image history entries to retain.
             - max_cot_history (int): Maximum number of chain-of-thought history entries to retain.
+            - history_encoding (str): "full" or "delta" encoding of past observations.
+            - memory (str): Summary of the steps evicted from the history: None, "extractive" or "llm".
+            - memory_interval (int): Number of evicted steps between LLM summary updates.
+            - collapse_repeats (bool): Merge consecutive steps with the same action and observation.
+            - prompt_layout (str): "sliding" or "blocks" advance of the history window.
+            - history_block_size (int): Number of steps dropped at once with the "blocks" layout.
     Returns:
         PromptBuilder: An instance of a prompt builder configured with the specified
             history limits and any additional parameters defined in the config.
@@ -21,4 +28,9 @@ def create_prompt_builder(config):
         max_history=config.max_history,
         max_image_history=config.max_image_history,
         max_cot_history=config.max_cot_history,
+        history_encoding=config.history_encoding,
+        memory=create_memory(config),
+        collapse_repeats=config.collapse_repeats,
+        prompt_layout=config.prompt_layout,
+        history_block_size=config.history_block_size,
     )
@@ -0,0 +1,79 @@
+def map_delta(previous_map, current_map, max_changed_cells=60):
+    """Describe the cells that changed between two ASCII maps.
+
+    Changes are grouped into runs of consecutive changed cells on the same row, e.g.
+    `y=5 x=10-11: "@." (was ".@")`.
+
+    Args:
+        previous_map (str): The previous map, one line per row.
+        current_map (str): The current map.
+        max_changed_cells (int, optional): Above this many changed cells, for instance after
+            changing level, only the count is reported. Defaults to 60.
+
+    Returns:
+        str: One line per run of changed cells, "no change", or the count of changed cells.
+    """
+    previous_rows = previous_map.split("\n")
+    current_rows = current_map.split("\n")
+    runs = []
+    changed_cells = 0
+    for y in range(max(len(previous_rows), len(current_rows))):
+        previous_row = previous_rows[y] if y < len(previous_rows) else ""
+        current_row = current_rows[y] if y < len(current_rows) else ""
+        width = max(len(previous_row), len(current_row))
+        previous_row = previous_row.ljust(width)
+        current_row = current_row.ljust(width)
+        x = 0
+        while x < width:
+            if previous_row[x] == current_row[x]:
+                x += 1
+                continue
+            start = x
+            while x < width and previous_row[x] != current_row[x]:
+                x += 1
+            changed_cells += x - start
+            runs.append((y, start, x, current_row[start:x], previous_row[start:x]))
+
+    if not runs:
+        return "no change"
+    if changed_cells > max_changed_cells:
+        return f"{changed_cells} cells changed"
+
+    lines = []
+    for y, start, end, cells, previous_cells in runs:
+        columns = f"x={start}" if end - start == 1 else f"x={start}-{end - 1}"
+        lines.append(f'y={y} {columns}: "{cells}" (was "{previous_cells}")')
+    return "\n".join(lines)
+
+
+def observation_delta(previous, current):
+    """Encode an observation compactly, relative to the observation before it.
+
+    The text without the map is kept if it changed, since messages and the language
+    observation are short; the map is replaced by the cells that changed.
+
+    Args:
+        previous (dict, optional): The `text` of the previous observation, or None for the first one.
+        current (dict): The `text` of the observation, with `long_term_context` and, for NetHack, `map`.
+
+    Returns:
+        str: The encoded observation.
+    """
+    text = _without_map(current)
+    if previous is not None and text == _without_map(previous):
+        text = "(same as the previous observation)"
+
+    current_map = current.get("map")
+    if current_map is None:
+        return text
+    if previous is None or previous.get("map") is None:
+        return text + "\nmap: (omitted)\n"
+    return text + "\nmap changes:\n" + map_delta(previous["map"], current_map) + "\n"
+
+
+def _without_map(text):
+    """Return the long-term context without its map section."""
+    long_term_context = text.get("long_term_context", "")
+    if text.get("map") is None:
+        return long_term_context
+    return long_term_context.replace(f"\nmap:\n{text['map']}\n", "")
@@ -1,23 +1,86 @@
 from collections import deque
 from typing import List, Optional
 
+from .delta import observation_delta
+from .images import encode_image
+
 
 class Message:
-    """Represents a conversation message with role, content, and optional attachment."""
+    """Represents a conversation message with role, content, and optional attachment.
+
+    Messages are immutable, so prompts can share them (and their image attachments) without
+    copying. Use `extended` or `overlay` to derive a message with extra text.
+
+    `cache_prefix` marks the end of a prompt prefix that later requests will repeat, for APIs
+    that cache prompt prefixes only at explicit breakpoints.
+    """
+
+    __slots__ = ("role", "content", "attachment", "cache_prefix")
+
+    def __init__(self, role: str, content: str, attachment: Optional[object] = None, cache_prefix: bool = False):
+        object.__setattr__(self, "role", role)  # 'system', 'user', 'assistant'
+        object.__setattr__(self, "content", content)  # String content of the message
+        object.__setattr__(self, "attachment", attachment)
+        object.__setattr__(self, "cache_prefix", cache_prefix)
 
-    def __init__(self, role: str, content: str, attachment: Optional[object] = None):
-        self.role = role  # 'system', 'user', 'assistant'
-        self.content = content  # String content of the message
-        self.attachment = attachment
+    def __setattr__(self, name, value):
+        raise AttributeError("Message is immutable, use Message.extended or overlay to add text")
+
+    def __reduce__(self):
+        return (Message, (self.role, self.content, self.attachment, self.cache_prefix))
 
     def __repr__(self):
         return f"Message(role={self.role}, content={self.content}, attachment={self.attachment})"
 
+    def extended(self, text: str, separator: str = "\n\n") -> "Message":
+        """Return a new message with `text` appended to the content, sharing the attachment."""
+        return Message(self.role, self.content + separator + text, self.attachment)
+
+
+def overlay(messages: List[Message], text: str) -> List[Message]:
+    """Return the prompt with `text` appended to its last message if it is a user message.
+
+    Only the last message is replaced; the others, and `messages` itself, are left untouched.
+
+    Args:
+        messages (List[Message]): The prompt.
+        text (str): Stage-specific text, such as instructions, to append.
+
+    Returns:
+        List[Message]: A new list of messages.
+    """
+    if not messages or messages[-1].role != "user":
+        return list(messages)
+    return messages[:-1] + [messages[-1].extended(text)]
+
 
 class HistoryPromptBuilder:
     """Builds a prompt with a history of observations, actions, and reasoning.
     Maintains a configurable history of text, images, and chain-of-thought reasoning to
     construct prompt messages for conversational agents.
+
+    The prompt is built incrementally: each event is rendered once, when it is added, into a
+    ring buffer of messages that mirrors the event history. Only the event whose image or
+    reasoning falls out of the `max_image_history` or `max_cot_history` window is rendered
+    again. Stored events are never modified, and `get_prompt` is memoized until the next update.
+    Images are stored PNG-compressed and base64-encoded (see `EncodedImage`), and are dropped
+    as soon as they leave the image window.
+
+    With `history_encoding="delta"`, only the current observation is shown in full; earlier ones
+    show what changed since the observation before them (see `observation_delta`). With a
+    `memory`, the events that leave the window are condensed into a summary message shown
+    after the instructions.
+
+    With `prompt_layout="blocks"`, the window advances `history_block_size` steps at a time
+    instead of one, so between `max_history` and `max_history + history_block_size` steps are
+    shown. Until the next block is dropped, the prompt only changes after the previous
+    observation, or from the oldest step whose image or reasoning is still in its window, since
+    that step is rendered again once it leaves the window. Provider-side prefix caches can reuse
+    the part before it; the ends of the stable prefixes are marked with `Message.cache_prefix`.
+
+    With `collapse_repeats`, a step that repeats the action of the step
+    before and leads to the same observation text is merged into it, as one "repeated N times"
+    entry that takes a single step of the window.
     """
 
     def __init__(
@@ -26,18 +89,52 @@ class HistoryPromptBuilder:
         max_image_history: int = 1,
         system_prompt: Optional[str] = None,
         max_cot_history: int = 1,
+        history_encoding: str = "full",
+        memory=None,
+        collapse_repeats: bool = False,
+        prompt_layout: str = "sliding",
+        history_block_size: int = 8,
     ):
+        if history_encoding not in ("full", "delta"):
+            raise ValueError(f"Unknown history encoding: {history_encoding}")
+        if prompt_layout not in ("sliding", "blocks"):
+            raise ValueError(f"Unknown prompt layout: {prompt_layout}")
         self.max_history = max_history
         self.max_image_history = min(max_image_history, max_history)
         self.system_prompt = system_prompt
-        self._events = deque(maxlen=max_history * 2)  # Stores observations and actions
+        self.prompt_layout = prompt_layout
+        self.history_block_size = history_block_size
+        if prompt_layout == "blocks":
+            # Events are dropped a block of steps at a time, once the window holds one block too many
+            self._max_events = (max_history + history_block_size) * 2
+            self._dropped_events = history_block_size * 2
+        else:
+            self._max_events = max_history * 2
+            self._dropped_events = 1
+        self._events = deque()  # Stores observations and actions
+        self._messages = deque()  # Past-step rendering of each event in `_events`
         self._last_short_term_obs = None  # To store the latest short-term observation
         self.previous_reasoning = None
         self.max_cot_history = max_cot_history
+        self.history_encoding = history_encoding
+        self._last_observation_text = None  # `text` of the previous observation, for delta encoding
+        self.memory = memory
+        self._memory_message = None  # Summary of the evicted events
+        self.collapse_repeats = collapse_repeats
+        self._next_index = 0  # Index of the next event, counted since the last reset
+        self._image_events = deque()  # Indices of the observations whose image is in the prompt
+        self._cot_events = deque()  # Indices of the actions whose reasoning is in the prompt
+        self._prompt = None  # Memoized `get_prompt` result, as (icl_episodes, messages)
+
+    def attach_client(self, client):
+        """Give the memory the agent's LLM client, for memories that summarize with an LLM."""
+        if self.memory is not None:
+            self.memory.attach_client(client)
 
     def update_instruction_prompt(self, instruction: str):
         """Set the system-level instruction prompt."""
         self.system_prompt = instruction
+        self._prompt = None
 
     def update_observation(self, obs: dict):
         """Add an observation to the prompt history, including text and optionall an image."""
@@ -45,20 +142,37 @@ class HistoryPromptBuilder:
         self._last_short_term_obs = obs["text"].get("short_term_context", "")
         text = long_term_context
 
-        image = obs.get("image", None)
+        # Not read at all if no image is ever sent, so that lazy observations do not render it
+        image = obs.get("image", None) if self.max_image_history > 0 else None
+        if image is not None:
+            image = encode_image(image)  # Compressed once here
+
+        past_text = text
+        if self.history_encoding == "delta":
+            past_text = observation_delta(self._last_observation_text, obs["text"])
+        self._last_observation_text = obs["text"]
+
+        if self.collapse_repeats and self._repeats_previous_step(text):
+            action = self._pop_event()
+            past_text = self._pop_event()["past_text"]  # Relative to the observation before the run
+            repeat = self._pop_event().get("repeat", 1) + 1
+            self._append_action({**action, "repeat": repeat})
 
         # Add observation to events
-        self._events.append(
+        self._append_event(
             {
                 "type": "observation",
                 "text": text,
+                "past_text": past_text,  # Shown once the observation is no longer the current one
                 "image": image,
-            }
+            },
+            self._image_events if image is not None else None,
+            self.max_image_history,
         )
 
     def update_action(self, action: str):
         """Add an action to the prompt history, including reasoning if available."""
-        self._events.append(
+        self._append_action(
             {
                 "type": "action",
                 "action": action,
@@ -73,57 +187,166 @@ class HistoryPromptBuilder:
     def reset(self):
         """Clear the event history."""
         self._events.clear()
+        self._messages.clear()
+        self._image_events.clear()
+        self._cot_events.clear()
+        self._last_observation_text = None
+        self._prompt = None
+        if self.memory is not None:
+            self.memory.reset()
+            self._memory_message = None
+
+    def _repeats_previous_step(self, text):
+        """Whether the last action and an observation with `text` repeat the step before them."""
+        events = self._events
+        return (
+            len(events) >= 3
+            and events[-1]["type"] == "action"
+            and events[-3]["type"] == "action"
+            and events[-1]["action"] == events[-3]["action"]
+            and events[-2]["text"] == text
+        )
+
+    def _append_action(self, event):
+        """Add an action event, entering the reasoning window if it has a reasoning."""
+        window = self._cot_events if event["reasoning"] is not None else None
+        self._append_event(event, window, self.max_cot_history)
+
+    def _pop_event(self):
+        """Remove and return the most recent event."""
+        self._next_index -= 1
+        for window in (self._image_events, self._cot_events):
+            if window and window[-1] == self._next_index:
+                window.pop()
+        self._messages.pop()
+        self._prompt = None
+        return self._events.pop()
+
+    def _append_event(self, event, window, window_size):
+        """Add an event and render it, updating the image or reasoning window it enters.
+
+        Args:
+            event (dict): The event. It is not modified afterwards.
+            window (deque, optional): Indices of the events whose image or reasoning is shown, if the
+                event has one.
+            window_size (int): Number of most recent images or reasonings that are shown.
+        """
+        index = self._next_index
+        self._next_index += 1
+        self._events.append(event)
+        self._prompt = None
+
+        if window is not None:
+            window.append(index)
+        self._messages.append(self._render(event, index))
+        while window is not None and len(window) > window_size:
+            self._rerender(window.popleft())
+
+        if len(self._events) > self._max_events:
+            for _ in range(min(self._dropped_events, len(self._events))):
+                self._drop_oldest_event()
+
+    def _drop_oldest_event(self):
+        """Remove the oldest event from the history, passing it to the memory if there is one."""
+        event = self._events.popleft()
+        self._messages.popleft()
+        if self.memory is not None:
+            self._remember(event)
+
+    def _mark_cache_prefixes(self, messages, history_start):
+        """Mark the ends of the prompt prefixes that the next prompts will repeat.
+
+        These are the instructions and summary before the history, the last complete block of
+        steps, and the previous step, which change only when a block is dropped. Events whose image
+        or reasoning is still shown will be rendered again, so no prefix extends past them.
+
+        Args:
+            messages (list): The prompt, modified in place.
+            history_start (int): Position of the first history message in the prompt.
+        """
+        block_events = self.history_block_size * 2
+        past_events = len(self._events)
+        if self._events and self._events[-1]["type"] == "observation":
+            past_events -= 1  # The current observation changes at every step
+        first_index = self._next_index - len(self._events)
+        stable_events = past_events
+        for window in (self._image_events, self._cot_events):
+            index = next((index for index in window if index >= first_index), None)
+            if index is not None:
+                stable_events = min(stable_events, index - first_index)
+        ends = {
+            history_start + min(end, stable_events)
+            for end in (0, past_events // block_events * block_events, past_events)
+        }
+        for end in ends:
+            if 0 < end < len(messages):
+                message = messages[end - 1]
+                messages[end - 1] = Message(message.role, message.content, message.attachment, cache_prefix=True)
+
+    def _remember(self, event):
+        """Pass an event that is about to leave the history window to the memory."""
+        if self.memory.add(event):
+            summary = self.memory.summary()
+            if summary:
+                self._memory_message = Message(role="user", content="Summary of the earlier steps:\n" + summary)
+
+    def _rerender(self, index):
+        """Render again the event at `index`, if it is still in the history.
+
+        An observation that left the image window will not be sent with its image again, so the
+        image is dropped from the history.
+        """
+        position = index - (self._next_index - len(self._events))
+        if position >= 0:
+            event = self._events[position]
+            if event["type"] == "observation" and event["image"] is not None:
+                event = self._events[position] = {**event, "image": None}
+            self._messages[position] = self._render(event, index)
+
+    def _render(self, event, index):
+        """Render an event as it appears in the prompt once it is no longer the current observation."""
+        if event["type"] == "observation":
+            image = event["image"] if self._image_events and index >= self._image_events[0] else None
+            image_obs = "\nImage observation provided." if image is not None else ""
+            return Message(role="user", content="Observation:\n" + event["past_text"] + image_obs, attachment=image)
+
+        if event["reasoning"] is not None and self._cot_events and index >= self._cot_events[0]:
+            content = "Previous plan:\n" + event["reasoning"]
+        else:
+            content = event["action"]
+        if event.get("repeat", 1) > 1:
+            content += f" (repeated {event['repeat']} times)"
+        return Message(role="assistant", content=content)
 
     def get_prompt(self, icl_episodes=False) -> List[Message]:
         """Generate a list of Message objects representing the prompt.
         Returns:
             List[Message]: Messages constructed from the event history.
         """
+        if self._prompt is not None and self._prompt[0] == icl_episodes:
+            return list(self._prompt[1])
+
         messages = []
 
         if self.system_prompt and not icl_episodes:
             messages.append(Message(role="user", content=self.system_prompt))
 
-        # Determine which images to include
-        images_needed = self.max_image_history
-        for event in reversed(self._events):
-            if event["type"] == "observation":
-                if images_needed > 0 and event.get("image") is not None:
-                    event["include_image"] = True
-                    images_needed -= 1
-                else:
-                    event["include_image"] = False
-
-        # determine the reasoning to include
-        reasoning_needed = self.max_cot_history
-        for event in reversed(self._events):
-            if event["type"] == "action":
-                if reasoning_needed > 0 and event.get("reasoning") is not None:
-                    reasoning_needed -= 1
-                else:
-                    event["reasoning"] = None
-
-        # Process events to create messages
-        for idx, event in enumerate(self._events):
-            if event["type"] == "observation":
-                content = event["text"]
-                image = event.get("image") if event.get("include_image", False) else None
-                image_obs = "\nImage observation provided." if image is not None else ""
-                if idx == len(self._events) - 1:
-                    content = "Current Observation:\n" + self._last_short_term_obs + "\n" + event["text"] + image_obs
-                else:
-                    content = "Observation:\n" + event["text"] + image_obs
-                message = Message(role="user", content=content, attachment=image)
-
-                # Clean up the temporary flag
-                if "include_image" in event:
-                    del event["include_image"]
-            elif event["type"] == "action":
-                if event.get("reasoning") is not None:
-                    content = "Previous plan:\n" + event["reasoning"]
-                else:
-                    content = event["action"]
-                message = Message(role="assistant", content=content)
-            messages.append(message)
-
-        return messages
\ No newline at end of file
+        if self._memory_message is not None:
+            messages.append(self._memory_message)
+
+        history_start = len(messages)
+        messages.extend(self._messages)
+
+        # The current observation also shows the short-term context
+        if self._events and self._events[-1]["type"] == "observation":
+            event = self._events[-1]
+            image = messages[-1].attachment
+            image_obs = "\nImage observation provided." if image is not None else ""
+            content = "Current Observation:\n" + self._last_short_term_obs + "\n" + event["text"] + image_obs
+            messages[-1] = Message(role="user", content=content, attachment=image)
+
+        if self.prompt_layout == "blocks":
+            self._mark_cache_prefixes(messages, history_start)
+
+        self._prompt = (icl_episodes, messages)
+        return list(messages)
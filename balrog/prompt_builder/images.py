@@ -0,0 +1,36 @@
+import base64
+from io import BytesIO
+
+
+class EncodedImage:
+    """An image observation stored as PNG bytes, with the base64 payload the APIs expect.
+
+    Frames are compressed once when they enter the history, instead of keeping the decoded
+    pixels around and re-encoding them for every request they appear in.
+    """
+
+    __slots__ = ("png", "base64", "size")
+
+    media_type = "image/png"
+
+    def __init__(self, image):
+        """Compress an image.
+
+        Args:
+            image (PIL.Image.Image): The image observation.
+        """
+        buffered = BytesIO()
+        image.save(buffered, format="PNG")
+        self.png = buffered.getvalue()
+        self.base64 = base64.b64encode(self.png).decode("utf-8")
+        self.size = image.size
+
+    def __repr__(self):
+        return f"EncodedImage(size={self.size}, bytes={len(self.png)})"
+
+
+def encode_image(image):
+    """Return `image` as an `EncodedImage`, compressing it unless it already is one."""
+    if isinstance(image, EncodedImage):
+        return image
+    return EncodedImage(image)
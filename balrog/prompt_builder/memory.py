@@ -0,0 +1,173 @@
+import logging
+import re
+from collections import Counter
+
+from balrog.retrieval.observation import glyph_entities, parse_sections
+
+from .history import Message
+
+logger = logging.getLogger(__name__)
+
+# "Dlvl:3" in the NetHack status lines at the bottom of the map
+DEPTH_PATTERN = re.compile(r"Dlvl:(\d+)")
+
+
+class ExtractiveMemory:
+    """Summarizes the steps that left the history window without calling an LLM.
+
+    Keeps the dungeon levels visited, the recent game messages, the monsters, objects and
+    features seen, and the most frequent actions. Everything is extracted from the rendered
+    observations, so environments other than NetHack only get the step and action counts.
+    """
+
+    def __init__(self, max_messages=10, max_entities=20, max_actions=5):
+        """Initialize the memory.
+
+        Args:
+            max_messages (int, optional): Number of recent game messages to keep. Defaults to 10.
+            max_entities (int, optional): Number of recently seen entities to keep. Defaults to 20.
+            max_actions (int, optional): Number of most frequent actions to report. Defaults to 5.
+        """
+        self.max_messages = max_messages
+        self.max_entities = max_entities
+        self.max_actions = max_actions
+        self.reset()
+
+    def reset(self):
+        """Forget everything, at the start of an episode."""
+        self.steps = 0
+        self.levels = []
+        self.messages = []
+        self.entities = []
+        self.actions = Counter()
+
+    def attach_client(self, client):
+        """Does nothing, the extractive memory does not use an LLM."""
+
+    def add(self, event):
+        """Take in an event evicted from the history window.
+
+        Args:
+            event (dict): An observation or action event of `HistoryPromptBuilder`.
+
+        Returns:
+            bool: Whether the summary changed.
+        """
+        if event["type"] == "action":
+            self.steps += 1
+            self.actions[event["action"]] += 1
+            return True
+
+        text = event["text"]
+        for depth in DEPTH_PATTERN.findall(text):
+            if int(depth) not in self.levels:
+                self.levels.append(int(depth))
+        sections = parse_sections(text)
+        message = sections.get("message", "")
+        if message and message not in self.messages[-1:]:
+            self.messages = (self.messages + [message])[-self.max_messages :]
+        for entity in glyph_entities(sections.get("language observation", "")):
+            if entity in self.entities:
+                self.entities.remove(entity)
+            self.entities.append(entity)
+        self.entities = self.entities[-self.max_entities :]
+        return True
+
+    def summary(self):
+        """Return the summary, or None if no step has been evicted yet."""
+        if not self.steps:
+            return None
+        lines = [f"Steps before the history below: {self.steps}"]
+        if self.levels:
+            lines.append("Dungeon levels visited: " + ", ".join(str(level) for level in self.levels))
+        if self.messages:
+            lines.append("Recent messages: " + " | ".join(self.messages))
+        if self.entities:
+            lines.append("Seen, most recent last: " + ", ".join(self.entities))
+        actions = ", ".join(f"{action} x{count}" for action, count in self.actions.most_common(self.max_actions))
+        lines.append(f"Most frequent actions: {actions}")
+        return "\n".join(lines)
+
+
+class LLMMemory:
+    """Condenses the steps that left the history window into a running summary with an LLM.
+
+    Evicted steps are buffered and folded into the summary every `interval` steps, in one
+    request that is recorded under the "memory" stage of the client's usage ledger.
+    """
+
+    summary_prompt = """
+Below is a summary of an ongoing game, followed by the steps that happened next.
+Update the summary with the new steps. Keep the levels visited, important items, threats, and unfinished goals, and drop details that no longer matter.
+Answer with the updated summary only, in at most 150 words.
+
+Summary:
+{summary}
+
+Next steps:
+{steps}
+    """.strip()
+
+    def __init__(self, interval=8):
+        """Initialize the memory.
+
+        Args:
+            interval (int, optional): Number of evicted steps to buffer before updating the summary. Defaults to 8.
+        """
+        self.interval = interval
+        self.client = None
+        self.reset()
+
+    def reset(self):
+        """Forget everything, at the start of an episode."""
+        self.text = None
+        self.pending = []
+
+    def attach_client(self, client):
+        """Set the LLM client used to write the summary."""
+        self.client = client
+
+    def add(self, event):
+        """Take in an event evicted from the history window.
+
+        Args:
+            event (dict): An observation or action event of `HistoryPromptBuilder`.
+
+        Returns:
+            bool: Whether the summary changed.
+        """
+        if event["type"] == "observation":
+            self.pending.append("Observation:\n" + event["text"])
+        else:
+            self.pending.append("Action: " + event["action"])
+        if event["type"] != "action" or len(self.pending) < 2 * self.interval:
+            return False
+
+        prompt = self.summary_prompt.format(summary=self.text or "(nothing yet)", steps="\n".join(self.pending))
+        with self.client.ledger.stage("memory"):
+            self.text = self.client.generate([Message(role="user", content=prompt)]).completion
+        self.pending = []
+        return True
+
+    def summary(self):
+        """Return the summary, or None if it has not been written yet."""
+        return self.text
+
+
+def create_memory(config):
+    """Create the memory selected by `config.memory`, or None.
+
+    Args:
+        config: The agent config, with `memory` and `memory_interval`.
+
+    Returns:
+        ExtractiveMemory or LLMMemory or None: The memory. The agent attaches its client to it,
+            see `HistoryPromptBuilder.attach_client`.
+    """
+    if config.memory is None:
+        return None
+    if config.memory == "extractive":
+        return ExtractiveMemory()
+    if config.memory == "llm":
+        return LLMMemory(interval=config.memory_interval)
+    raise ValueError(f"Unknown memory: {config.memory}")
@@ -0,0 +1,4 @@
+from .lexical import BM25Index, normalize_title, tokenize
+from .observation import ChangeDetector, observation_queries
+from .server import RetrievalClient, RetrievalServer, connect_retriever, create_retriever
+from .wiki_search import NethackWikiSearch, reciprocal_rank_fusion
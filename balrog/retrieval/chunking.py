@@ -0,0 +1,79 @@
+import re
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    """Estimate the number of LLM tokens in `text` (roughly four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _split_to_fit(text, max_tokens):
+    """Split a paragraph that is too long on its own, by sentence and then by word."""
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    pieces = SENTENCE_PATTERN.split(text)
+    if len(pieces) == 1:
+        words = text.split()
+        if len(words) == 1:
+            width = 4 * max_tokens
+            return [text[start : start + width] for start in range(0, len(text), width)]
+        pieces = words
+
+    parts = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current} {piece}".strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            parts.extend(_split_to_fit(current, max_tokens))
+            current = piece
+        else:
+            current = candidate
+    if current:
+        parts.extend(_split_to_fit(current, max_tokens))
+    return parts
+
+
+def chunk_article(title, text, max_tokens=256):
+    """Split a wiki article into passages of at most `max_tokens` estimated tokens.
+
+    Paragraphs are packed greedily, so passages break on paragraph boundaries whenever possible.
+    Chunk ids are `"<title>#<position>"` and stay stable as long as the article text does not change.
+
+    Args:
+        title (str): Article title.
+        text (str): Article content.
+        max_tokens (int, optional): Maximum estimated tokens per chunk. Defaults to 256.
+
+    Returns:
+        list: Chunk dictionaries with `id`, `title`, `position`, `text` and `tokens`.
+    """
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            paragraphs.extend(_split_to_fit(paragraph, max_tokens))
+
+    texts = []
+    current = ""
+    for paragraph in paragraphs:
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if current and estimate_tokens(candidate) > max_tokens:
+            texts.append(current)
+            current = paragraph
+        else:
+            current = candidate
+    if current:
+        texts.append(current)
+
+    return [
+        {
+            "id": f"{title}#{position}",
+            "title": title,
+            "position": position,
+            "text": chunk,
+            "tokens": estimate_tokens(chunk),
+        }
+        for position, chunk in enumerate(texts)
+    ]
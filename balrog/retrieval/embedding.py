@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ["sentence_transformers", "onnx", "onnx_int8"]
+
+
+def int8_path(onnx_path):
+    """Path of the dynamically quantized copy of an exported ONNX model."""
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}.int8{ext or '.onnx'}"
+
+
+def hub_name(model_name):
+    """Resolve a short sentence transformer name (e.g. "all-MiniLM-L6-v2") for `transformers`."""
+    if "/" in model_name or os.path.exists(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+class SentenceTransformerEncoder:
+    """Encodes queries with the reference `sentence_transformers` model in full precision."""
+
+    def __init__(self, model_name, threads=None):
+        """Initialize the encoder. `torch` is only imported here, so other backends never pay for it.
+
+        Args:
+            model_name (str): Sentence transformer name or path.
+            threads (int, optional): Number of torch intra-op threads. Defaults to torch's choice.
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts):
+        """Embed `texts` into a float32 array of shape `(len(texts), dim)`."""
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+class OnnxEncoder:
+    """Encodes queries with an ONNX Runtime export of a mean-pooled, normalized sentence transformer.
+
+    This matches the `all-MiniLM-L6-v2` family: a BERT encoder followed by mean pooling over the
+    attention mask and L2 normalization. Export the model with `balrog-export-embedding-model`.
+    """
+
+    def __init__(self, onnx_path, model_name, threads=None, max_length=256):
+        """Initialize the encoder.
+
+        Args:
+            onnx_path (str): Path to the exported ONNX model.
+            model_name (str): Sentence transformer name or path, used for its tokenizer.
+            threads (int, optional): Number of ONNX Runtime intra-op threads. Defaults to ONNX Runtime's choice.
+            max_length (int, optional): Maximum number of tokens per query. Defaults to 256.
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX embedding model not found: {onnx_path}. Export it with `balrog-export-embedding-model`."
+            )
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(hub_name(model_name))
+        self.max_length = max_length
+
+    def encode(self, texts):
+        """Embed `texts` into a float32 array of shape `(len(texts), dim)`."""
+        if isinstance(texts, str):
+            texts = [texts]
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+
+def create_encoder(config):
+    """Create the query encoder selected by `agent.embedding_backend`.
+
+    Args:
+        config (omegaconf.DictConfig): Configuration with the embedding settings under `agent`.
+
+    Returns:
+        SentenceTransformerEncoder or OnnxEncoder: An object with an `encode(texts)` method.
+    """
+    backend = config.agent.embedding_backend
+    threads = config.agent.embedding_threads
+    if backend == "sentence_transformers":
+        return SentenceTransformerEncoder(config.agent.embedding_model, threads=threads)
+    if backend == "onnx":
+        return OnnxEncoder(config.agent.embedding_onnx_path, config.agent.embedding_model, threads=threads)
+    if backend == "onnx_int8":
+        return OnnxEncoder(int8_path(config.agent.embedding_onnx_path), config.agent.embedding_model, threads=threads)
+    raise ValueError(f"Unknown embedding backend: {backend}. Choose one of {EMBEDDING_BACKENDS}.")
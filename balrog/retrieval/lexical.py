@@ -0,0 +1,203 @@
+import json
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase `text` and split it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def normalize_title(text):
+    """Normalize a wiki title or entity name so that lookups ignore case and punctuation."""
+    return " ".join(tokenize(text))
+
+
+# Words that never identify a wiki article on their own.
+STOPWORDS = set(
+    "a an and are at be but by for from here in is it its of on or that the there this to was what which with you your".split()
+)
+
+
+class EntityTable:
+    """Maps normalized entity names to the wiki article of the same title."""
+
+    def __init__(self, titles, max_ngram=4):
+        """Initialize the table.
+
+        Args:
+            titles (list): Document titles, in document store order.
+            max_ngram (int, optional): Longest phrase, in words, tried by `link`. Defaults to 4.
+        """
+        self.max_ngram = max_ngram
+        self.lookup = {}
+        for doc_idx, title in enumerate(titles):
+            self.lookup.setdefault(normalize_title(title), doc_idx)
+
+    def match(self, name):
+        """Return the document titled `name`, if any.
+
+        Simple plurals ("cockatrices", "wands of digging") are matched against the singular title.
+
+        Args:
+            name (str): Query or entity name.
+
+        Returns:
+            int or None: Index of the matching document.
+        """
+        name = normalize_title(name)
+        if not name:
+            return None
+        if name in self.lookup:
+            return self.lookup[name]
+
+        words = name.split()
+        for position in [0, len(words) - 1]:
+            word = words[position]
+            for suffix in ["es", "s"]:
+                if word.endswith(suffix) and len(word) > len(suffix) + 2:
+                    candidate = words[:position] + [word[: -len(suffix)]] + words[position + 1 :]
+                    doc_idx = self.lookup.get(" ".join(candidate))
+                    if doc_idx is not None:
+                        return doc_idx
+        return None
+
+    def link(self, text):
+        """Find every article named in free text, preferring the longest phrase at each position.
+
+        Args:
+            text (str): Free text such as a game message.
+
+        Returns:
+            list: Indices of the linked documents, in order of appearance.
+        """
+        words = tokenize(text)
+        linked = []
+        start = 0
+        while start < len(words):
+            for length in range(min(self.max_ngram, len(words) - start), 0, -1):
+                phrase = words[start : start + length]
+                if length == 1 and phrase[0] in STOPWORDS:
+                    continue
+                doc_idx = self.match(" ".join(phrase))
+                if doc_idx is not None:
+                    if doc_idx not in linked:
+                        linked.append(doc_idx)
+                    start += length
+                    break
+            else:
+                start += 1
+        return linked
+
+
+class BM25Index:
+    """Inverted index over the wiki document store, scored with Okapi BM25.
+
+    Documents are addressed by their position in the document store, which is the same
+    position the FAISS index uses, so lexical and dense rankings can be fused directly.
+    """
+
+    def __init__(self, titles, postings, doc_lengths, doc_ids=None, k1=1.5, b=0.75):
+        """Initialize the index from precomputed postings.
+
+        Args:
+            titles (list): Document titles, in document store order. Chunks of one article share its title.
+            postings (dict): Maps a term to a list of `[doc_idx, term_frequency]` pairs.
+            doc_lengths (list): Number of indexed tokens per document.
+            doc_ids (list, optional): Unique document ids. Defaults to the titles.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+        """
+        self.titles = titles
+        self.doc_ids = doc_ids if doc_ids is not None else titles
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+        num_docs = len(doc_lengths)
+        self.avg_doc_length = sum(doc_lengths) / num_docs if num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in postings.items()
+        }
+        self.entities = EntityTable(titles)
+
+    @classmethod
+    def build(cls, documents, doc_ids=None, title_weight=3, k1=1.5, b=0.75):
+        """Build the index from `(title, text)` pairs.
+
+        Args:
+            documents (list): `(title, text)` pairs, in document store order.
+            doc_ids (list, optional): Unique document ids. Defaults to the titles.
+            title_weight (int, optional): How many times title tokens are counted. Defaults to 3.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+
+        Returns:
+            BM25Index: The built index.
+        """
+        titles = []
+        postings = {}
+        doc_lengths = []
+        for doc_idx, (title, text) in enumerate(documents):
+            tokens = tokenize(text) + tokenize(title) * title_weight
+            titles.append(title)
+            doc_lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).append([doc_idx, count])
+        return cls(titles, postings, doc_lengths, doc_ids=doc_ids, k1=k1, b=b)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index previously written with `save`."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["titles"],
+            data["postings"],
+            data["doc_lengths"],
+            doc_ids=data.get("doc_ids"),
+            k1=data["k1"],
+            b=data["b"],
+        )
+
+    def save(self, path):
+        """Write the index to `path` as JSON."""
+        data = {
+            "titles": self.titles,
+            "doc_ids": self.doc_ids,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+            "k1": self.k1,
+            "b": self.b,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    def match_title(self, query):
+        """Return the document whose title is exactly `query`, if any."""
+        return self.entities.match(query)
+
+    def search(self, query, top_k):
+        """Rank documents for `query` with BM25.
+
+        Args:
+            query (str): Free-text query.
+            top_k (int): Number of documents to return.
+
+        Returns:
+            list: `(doc_idx, score)` pairs sorted by decreasing score.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in docs:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_idx] / self.avg_doc_length
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
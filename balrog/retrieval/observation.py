@@ -0,0 +1,168 @@
+import re
+
+SECTION_NAMES = ["message", "language observation", "cursor", "map", "statistics", "inventory"]
+
+# "newt very near west" -> "newt"
+GLYPH_PATTERN = re.compile(r"^(?P<name>.+?) (?:adjacent|very near|near|very far|far) [a-z]+$")
+# "a: 2 uncursed +1 daggers (in quiver)" -> "daggers"
+INVENTORY_PATTERN = re.compile(
+    r"^(?:[a-zA-Z$]: )?(?:\d+ |an? |the )?(?:(?:blessed|uncursed|cursed|partly eaten|rusty|very rusty) )*"
+    r"(?:[+-]\d+ )?(?P<name>[^(]+?)(?: named [^(]+)?(?: \(.*\))?$"
+)
+MONSTER_PREFIXES = ["tame ", "peaceful "]
+
+# Terrain that is on screen almost every step and never worth a lookup.
+IGNORED_ENTITIES = {
+    "dark area",
+    "dark part of a room",
+    "floor of a room",
+    "horizontal wall",
+    "vertical wall",
+    "corridor",
+    "lit corridor",
+    "stone",
+    "solid stone",
+}
+
+
+def parse_sections(text):
+    """Split a rendered NetHack observation into its named sections.
+
+    Observations are rendered as blocks of the form `"<name>:\\n<value>\\n"`, see
+    `NLELanguageWrapper.render_text` and `NLELanguageWrapper.render_hybrid`.
+
+    Args:
+        text (str): Rendered observation text.
+
+    Returns:
+        dict: Maps section names (e.g. "message", "inventory") to their stripped values.
+    """
+    sections = {}
+    current = None
+    for line in text.split("\n"):
+        if line.endswith(":") and line[:-1] in SECTION_NAMES:
+            current = line[:-1]
+            sections[current] = []
+        elif current is not None:
+            sections[current].append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items()}
+
+
+def glyph_entities(text_glyphs):
+    """Extract monster, object and feature names from the language observation, nearest first."""
+    entities = []
+    for line in text_glyphs.split("\n"):
+        match = GLYPH_PATTERN.match(line.strip())
+        if not match:
+            continue
+        name = match.group("name")
+        for prefix in MONSTER_PREFIXES:
+            if name.startswith(prefix):
+                name = name[len(prefix) :]
+        if name not in IGNORED_ENTITIES and name not in entities:
+            entities.append(name)
+    return entities
+
+
+def inventory_entities(text_inventory):
+    """Extract item names from the inventory listing."""
+    entities = []
+    for line in text_inventory.split("\n"):
+        match = INVENTORY_PATTERN.match(line.strip())
+        if match and match.group("name") not in entities:
+            entities.append(match.group("name"))
+    return entities
+
+
+def observation_queries(obs):
+    """Derive retrieval queries directly from a NetHack observation, without asking the LLM.
+
+    Args:
+        obs (dict): The current observation in the environment.
+
+    Returns:
+        tuple: The current message (for keyword linking), and a list of entity names from the
+            screen and the inventory, in priority order.
+    """
+    sections = parse_sections(obs["text"].get("long_term_context", ""))
+    sections.update(parse_sections(obs["text"].get("short_term_context", "")))
+
+    entities = glyph_entities(sections.get("language observation", ""))
+    for name in inventory_entities(sections.get("inventory", "")):
+        if name not in entities:
+            entities.append(name)
+    return sections.get("message", ""), entities
+
+
+class ChangeDetector:
+    """Detects whether the game situation changed enough to warrant a new retrieval.
+
+    Walking down a corridor only moves the player by one tile per step, so the retrieved
+    advice stays relevant. A step counts as significant when a new kind of monster, object
+    or feature comes into view, a new message appears, the dungeon level or inventory
+    changes, or the player loses hit points.
+    """
+
+    # Indices into NLE's `blstats`, see `Progress._update_stats`.
+    HITPOINTS = 10
+    DEPTH = 12
+
+    def __init__(self, enabled=True, max_reuse=10):
+        """Initialize the detector.
+
+        Args:
+            enabled (bool, optional): If False, every step counts as significant. Defaults to True.
+            max_reuse (int, optional): Maximum number of consecutive steps without a significant
+                change before a refresh is forced anyway. Defaults to 10.
+        """
+        self.enabled = enabled
+        self.max_reuse = max_reuse
+        self.reset()
+
+    def reset(self):
+        """Forget the previous situation, so that the next step counts as significant."""
+        self.previous = None
+        self.steps_since_change = 0
+
+    def snapshot(self, obs):
+        """Summarize the parts of an observation that can trigger a new retrieval."""
+        sections = parse_sections(obs["text"].get("long_term_context", ""))
+        sections.update(parse_sections(obs["text"].get("short_term_context", "")))
+        raw_obs = obs.get("obs")
+        blstats = raw_obs.get("blstats") if isinstance(raw_obs, dict) else None
+        return {
+            "entities": set(glyph_entities(sections.get("language observation", ""))),
+            "message": sections.get("message", ""),
+            "inventory": sections.get("inventory", ""),
+            "depth": int(blstats[self.DEPTH]) if blstats is not None else None,
+            "hitpoints": int(blstats[self.HITPOINTS]) if blstats is not None else None,
+        }
+
+    def update(self, obs):
+        """Record the current observation and report whether it differs significantly from the last one.
+
+        Args:
+            obs (dict): The current observation in the environment.
+
+        Returns:
+            bool: True if the agent should retrieve again.
+        """
+        if not self.enabled:
+            return True
+
+        current = self.snapshot(obs)
+        previous, self.previous = self.previous, current
+        if previous is None:
+            self.steps_since_change = 0
+            return True
+
+        changed = (
+            bool(current["entities"] - previous["entities"])
+            or (current["message"] and current["message"] != previous["message"])
+            or current["inventory"] != previous["inventory"]
+            or current["depth"] != previous["depth"]
+            or (current["hitpoints"] is not None and current["hitpoints"] < previous["hitpoints"])
+            or self.steps_since_change >= self.max_reuse
+        )
+        self.steps_since_change = 0 if changed else self.steps_since_change + 1
+        return bool(changed)
@@ -0,0 +1,162 @@
+import logging
+import queue
+import time
+import traceback
+
+from balrog.retrieval.wiki_search import NethackWikiSearch
+
+logger = logging.getLogger(__name__)
+
+# Set in evaluation workers by `connect_retriever`, so that agents created there share the server.
+_client = None
+
+
+class RetrievalServer:
+    """Answers wiki searches for all evaluation workers from a single process.
+
+    Queries that arrive within `rag_batch_window_ms` of each other are micro-batched: they are
+    encoded and searched together with `NethackWikiSearch.search_many`, and each answer is sent
+    back on the response queue of the worker that asked. The index is also loaded only once,
+    instead of once per worker.
+    """
+
+    def __init__(self, config, num_clients, ctx):
+        """Initialize the server.
+
+        Args:
+            config (omegaconf.DictConfig): Configuration with the wiki index settings under `agent`.
+            num_clients (int): Number of workers that will connect, one response queue each.
+            ctx (multiprocessing.context.BaseContext): Context the queues and the server process are created from.
+                It should be the one used for the workers.
+        """
+        self.config = config
+        self.window = config.agent.rag_batch_window_ms / 1000
+        self.max_batch = config.agent.rag_max_batch
+        self.ctx = ctx
+        self.requests = ctx.Queue()
+        self.responses = [ctx.Queue() for _ in range(num_clients)]
+        self.process = None
+
+    def start(self):
+        """Start serving in a new process."""
+        self.process = self.ctx.Process(target=self._serve, daemon=True)
+        self.process.start()
+
+    def stop(self):
+        """Ask the server to exit once the pending requests are answered, and wait for it."""
+        self.requests.put(None)
+        self.process.join()
+
+    def client(self, client_id):
+        """Return the client for the worker that owns response queue `client_id`."""
+        return RetrievalClient(self.requests, self.responses[client_id], client_id)
+
+    def _serve(self):
+        try:
+            search = NethackWikiSearch(self.config)
+            search.load_index()
+        except Exception as e:
+            # Keep serving, so that the workers get an error instead of waiting forever for an answer
+            logger.error(f"Retrieval server failed to load the wiki index: {e}\n{traceback.format_exc()}")
+            search = None
+            load_error = f"failed to load the wiki index: {e}"
+
+        stopping = False
+        while not stopping:
+            request = self.requests.get()
+            if request is None:
+                break
+
+            batch = [request]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            if search is None:
+                self._fail(batch, load_error)
+            else:
+                self._answer(search, batch)
+
+    def _answer(self, search, batch):
+        try:
+            queries = [payload for _, kind, payload in batch if kind == "search"]
+            answers = iter(search.search_many(queries)) if queries else iter([])
+            responses = [
+                next(answers) if kind == "search" else search.search_observation(payload) for _, kind, payload in batch
+            ]
+        except Exception as e:
+            logger.error(f"Retrieval server failed on a batch of {len(batch)} requests: {e}\n{traceback.format_exc()}")
+            self._fail(batch, str(e))
+            return
+
+        for (client_id, _, _), response in zip(batch, responses):
+            self.responses[client_id].put(("ok", response))
+
+    def _fail(self, batch, message):
+        for client_id, _, _ in batch:
+            self.responses[client_id].put(("error", message))
+
+
+class RetrievalClient:
+    """Stand-in for `NethackWikiSearch` that forwards searches to a `RetrievalServer`."""
+
+    def __init__(self, requests, responses, client_id):
+        self.requests = requests
+        self.responses = responses
+        self.client_id = client_id
+
+    def search(self, query):
+        """Search the wiki for documents relevant to `query` and return their content."""
+        return self.search_many([query])[0]
+
+    def search_many(self, queries):
+        """Search the wiki for several queries; the server batches them with other workers' queries."""
+        for query in queries:
+            self.requests.put((self.client_id, "search", query))
+        return [self._receive() for _ in queries]
+
+    def search_observation(self, obs):
+        """Retrieve the articles for what is on screen, see `NethackWikiSearch.search_observation`."""
+        # Only the rendered text is needed, so the image and raw NLE arrays are not sent.
+        self.requests.put((self.client_id, "search_observation", {"text": obs["text"]}))
+        return self._receive()
+
+    def _receive(self):
+        status, response = self.responses.get()
+        if status == "error":
+            raise RuntimeError(f"Retrieval server error: {response}")
+        return response
+
+
+def connect_retriever(server, client_id):
+    """Make `create_retriever` return a client of `server` in the current process."""
+    global _client
+    _client = server.client(client_id)
+
+
+def create_retriever(config):
+    """Return the wiki retriever for an agent.
+
+    Inside evaluation workers connected to a `RetrievalServer` this is a shared client;
+    otherwise a `NethackWikiSearch` with its index loaded.
+
+    Args:
+        config (omegaconf.DictConfig): Configuration with the wiki index settings under `agent`.
+
+    Returns:
+        NethackWikiSearch or RetrievalClient: An object with `search`, `search_many` and `search_observation`.
+    """
+    if _client is not None:
+        return _client
+    search = NethackWikiSearch(config)
+    search.load_index()
+    return search
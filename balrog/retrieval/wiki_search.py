@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from balrog.retrieval.chunking import estimate_tokens
+from balrog.retrieval.embedding import EMBEDDING_BACKENDS, create_encoder
+from balrog.retrieval.lexical import BM25Index, EntityTable, normalize_title
+from balrog.retrieval.observation import observation_queries
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several rankings of document indices with reciprocal rank fusion.
+
+    Args:
+        rankings (list): Lists of document indices, each sorted from best to worst.
+        k (int, optional): Damping constant; larger values flatten the contribution of top ranks. Defaults to 60.
+
+    Returns:
+        list: Document indices sorted by fused score.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_idx in enumerate(ranking):
+            scores[doc_idx] = scores.get(doc_idx, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class NethackWikiSearch:
+    """Handles parsing, indexing, and searching MediaWiki XML dumps with FAISS.
+
+    When a lexical index is available, dense and BM25 rankings are fused, and queries that
+    name a wiki article exactly are answered from the lexical index without encoding them.
+
+    The searchable documents are either whole articles (`nethack_wiki_store`) or token-bounded
+    chunks of them (`nethack_wiki_chunk_store`). Chunks of one article are stored contiguously,
+    so neighbouring chunks can be merged back together when the token budget allows.
+    """
+
+    # Passages are only truncated to fit the token budget if at least this many tokens remain.
+    MIN_PASSAGE_TOKENS = 64
+
+    def __init__(self, config):
+        self.config = config
+        self.embedding_model = config.agent.embedding_model
+        self.embedding_backend = config.agent.embedding_backend
+        self._model = None
+        self.faiss_index_path = config.agent.nethack_wiki_index
+        self.storage_path = config.agent.nethack_wiki_store
+        self.chunk_store_path = config.agent.nethack_wiki_chunk_store
+        self.chunk_index_path = config.agent.nethack_wiki_chunk_index
+        self.lexical_index_path = config.agent.nethack_wiki_lexical_index
+        self.glyph_lookup_path = config.agent.nethack_wiki_glyph_lookup
+        self.retrieval_mode = config.agent.retrieval_mode
+        self.rrf_k = config.agent.rrf_k
+        self.token_budget = config.agent.rag_token_budget
+        self.merge_neighbours = config.agent.rag_merge_neighbours
+        self.cache_size = config.agent.rag_cache_size
+        self.rank_cache = OrderedDict()
+        self.index = None
+        self.doc_ids = None
+        self.doc_titles = None
+        self.doc_texts = None
+        self.doc_tokens = None
+        self.chunked = False
+        self.lexical_index = None
+        self.entity_table = None
+        self.entity_passages = {}
+        self.top_k = config.agent.top_k
+
+        if self.retrieval_mode not in ["dense", "lexical", "hybrid"]:
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode}")
+        if self.embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {self.embedding_backend}")
+
+    @property
+    def model(self):
+        """The query encoder selected by `embedding_backend`, loaded on first use."""
+        if self._model is None:
+            self._model = create_encoder(self.config)
+        return self._model
+
+    def load_index(self):
+        """Loads the FAISS index, the lexical index and the document or chunk store if they exist."""
+        self.chunked = bool(self.chunk_store_path)
+        store_path = self.chunk_store_path if self.chunked else self.storage_path
+        faiss_index_path = self.chunk_index_path if self.chunked else self.faiss_index_path
+        required = [store_path] if self.retrieval_mode == "lexical" else [faiss_index_path, store_path]
+        missing = [path for path in required if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(
+                f"Wiki index not found: {', '.join(missing)}. Build it before running the RAG agents."
+            )
+        logger.info(f"Loading the saved wiki index from {', '.join(required)}")
+
+        if self.retrieval_mode != "lexical":
+            self.index = faiss.read_index(faiss_index_path)
+        with open(store_path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+        if self.chunked:
+            chunks = store["chunks"]
+            self.doc_ids = [chunk["id"] for chunk in chunks]
+            self.doc_titles = [chunk["title"] for chunk in chunks]
+            self.doc_texts = [chunk["text"] for chunk in chunks]
+            self.doc_tokens = [chunk["tokens"] for chunk in chunks]
+        else:
+            store.pop("_global_counts", None)
+            self.doc_ids = list(store.keys())
+            self.doc_titles = self.doc_ids
+            self.doc_texts = [doc["raw_text"] for doc in store.values()]
+            self.doc_tokens = [estimate_tokens(text) for text in self.doc_texts]
+
+        if self.retrieval_mode != "dense" and self.lexical_index_path and os.path.exists(self.lexical_index_path):
+            self.lexical_index = BM25Index.load(self.lexical_index_path)
+            if self.lexical_index.doc_ids != self.doc_ids:
+                raise ValueError(
+                    f"Lexical index {self.lexical_index_path} was not built from {store_path}. "
+                    "Rebuild it with `balrog-build-wiki-index`."
+                )
+        elif self.retrieval_mode != "dense":
+            raise FileNotFoundError(
+                f"Lexical index not found: {self.lexical_index_path}. Build it with `balrog-build-wiki-index`, "
+                "or use agent.retrieval_mode=dense."
+            )
+
+        self.entity_table = self.lexical_index.entities if self.lexical_index else EntityTable(self.doc_titles)
+        if self.glyph_lookup_path and os.path.exists(self.glyph_lookup_path):
+            self.load_glyph_lookup(self.glyph_lookup_path)
+
+    def load_glyph_lookup(self, path):
+        """Load the precomputed entity-to-passage table written by `balrog-build-glyph-lookup`.
+
+        Passages that are no longer in the document store are dropped.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            lookup = json.load(f)
+        if lookup["top_k"] < self.top_k:
+            logger.warning(
+                f"Glyph lookup {path} keeps {lookup['top_k']} passages per entity, fewer than top_k={self.top_k}. "
+                f"Rebuild it with `balrog-build-glyph-lookup agent.top_k={self.top_k}`."
+            )
+        id_to_idx = {doc_id: idx for idx, doc_id in enumerate(self.doc_ids)}
+        self.entity_passages = {
+            name: [id_to_idx[doc_id] for doc_id in doc_ids if doc_id in id_to_idx]
+            for name, doc_ids in lookup["entities"].items()
+        }
+
+    def search(self, query):
+        """Search the wiki for documents relevant to `query` and return their content."""
+        if self.doc_texts is None or (self.index is None and self.lexical_index is None):
+            print("Index not loaded. Load or build it first.")
+            return []
+
+        return self.get_texts(self.rank(query))
+
+    def search_many(self, queries):
+        """Search the wiki for several queries at once, encoding and searching them as one batch.
+
+        Args:
+            queries (list): Free-text queries.
+
+        Returns:
+            list: For each query, the content of its documents, as returned by `search`.
+        """
+        if self.doc_texts is None or (self.index is None and self.lexical_index is None):
+            print("Index not loaded. Load or build it first.")
+            return [[] for _ in queries]
+
+        return [self.get_texts(ranking) for ranking in self.rank_many(queries)]
+
+    def search_observation(self, obs):
+        """Retrieve the articles for what is on screen, without an LLM-generated query.
+
+        Articles are looked up in O(1) without touching the dense index: first anything named in
+        the current message, then the best passage for each monster, object and feature in view
+        (nearest first) and in the inventory. Remaining slots are filled with the next-best
+        passages of those entities.
+
+        Args:
+            obs (dict): The current observation in the environment.
+
+        Returns:
+            list: Content of up to `top_k` articles.
+        """
+        if self.doc_texts is None:
+            print("Index not loaded. Load or build it first.")
+            return []
+
+        message, entities = observation_queries(obs)
+        ranking = self.entity_table.link(message)
+        fallback = []
+        for name in entities:
+            passages = self.lookup_entity(name)
+            primary = next((doc_idx for doc_idx in passages if doc_idx not in ranking), None)
+            if primary is not None:
+                ranking.append(primary)
+            fallback.extend(passages)
+            if len(ranking) >= self.top_k:
+                break
+        for doc_idx in fallback:
+            if len(ranking) >= self.top_k:
+                break
+            if doc_idx not in ranking:
+                ranking.append(doc_idx)
+
+        ranking = ranking[: self.top_k]
+        logger.info(f"RAG lookup: {', '.join(self.doc_titles[idx] for idx in ranking)}")
+        return self.get_texts(ranking)
+
+    def lookup_entity(self, name):
+        """Return the precomputed passages for an entity name, best first.
+
+        Names missing from the glyph lookup table fall back to an exact title match, then to
+        the first article named inside `name`.
+
+        Args:
+            name (str): Entity name, as rendered by the language observation.
+
+        Returns:
+            list: Document indices, possibly empty.
+        """
+        passages = self.entity_passages.get(normalize_title(name))
+        if passages:
+            return passages
+        doc_idx = self.entity_table.match(name)
+        if doc_idx is not None:
+            return [doc_idx]
+        return self.entity_table.link(name)[:1]
+
+    def get_texts(self, doc_indices):
+        """Return the passages for ranked documents, within the per-step token budget.
+
+        Documents are taken in rank order while they fit in `rag_token_budget`. Leftover budget
+        is spent on the chunks right after and before each hit, and adjacent chunks of the same
+        article are merged into a single passage.
+
+        Args:
+            doc_indices (list): Document indices, best first.
+
+        Returns:
+            list: Passage texts, ordered by their best-ranked document.
+        """
+        remaining = self.token_budget if self.token_budget is not None else float("inf")
+        selected = []
+        truncated = {}
+        for idx in doc_indices:
+            if self.doc_tokens[idx] <= remaining:
+                selected.append(idx)
+                remaining -= self.doc_tokens[idx]
+            elif remaining >= self.MIN_PASSAGE_TOKENS:
+                selected.append(idx)
+                truncated[idx] = self.doc_texts[idx][: 4 * int(remaining)]
+                remaining = 0
+
+        if self.merge_neighbours and self.chunked:
+            for idx in list(selected):
+                if idx in truncated:
+                    continue
+                for neighbour in [idx + 1, idx - 1]:
+                    if (
+                        0 <= neighbour < len(self.doc_ids)
+                        and neighbour not in selected
+                        and self.doc_titles[neighbour] == self.doc_titles[idx]
+                        and self.doc_tokens[neighbour] <= remaining
+                    ):
+                        selected.append(neighbour)
+                        remaining -= self.doc_tokens[neighbour]
+
+        rank_of = {idx: rank for rank, idx in enumerate(selected)}
+        passages = []
+        for idx in sorted(selected):
+            previous = passages[-1] if passages else None
+            if (
+                previous is not None
+                and previous["last"] == idx - 1
+                and self.doc_titles[idx] == self.doc_titles[idx - 1]
+                and idx - 1 not in truncated
+                and idx not in truncated
+            ):
+                previous["texts"].append(self.doc_texts[idx])
+                previous["last"] = idx
+                previous["rank"] = min(previous["rank"], rank_of[idx])
+            else:
+                text = truncated.get(idx, self.doc_texts[idx])
+                passages.append({"last": idx, "rank": rank_of[idx], "title": self.doc_titles[idx], "texts": [text]})
+
+        passages.sort(key=lambda passage: passage["rank"])
+        if not self.chunked:
+            return [passage["texts"][0] for passage in passages]
+        return [passage["title"] + "\n" + "\n\n".join(passage["texts"]) for passage in passages]
+
+    def rank(self, query):
+        """Return the indices of the `top_k` documents for `query`, best first."""
+        return self.rank_many([query])[0]
+
+    def rank_many(self, queries):
+        """Rank documents for several queries at once.
+
+        Queries that need the dense index are encoded and searched in a single batch. The last
+        `rag_cache_size` rankings are kept, so repeated queries skip the indexes entirely.
+
+        Args:
+            queries (list): Free-text queries.
+
+        Returns:
+            list: For each query, the indices of its `top_k` documents, best first.
+        """
+        rankings = {}
+        for query in queries:
+            if query in self.rank_cache:
+                self.rank_cache.move_to_end(query)
+                rankings[query] = self.rank_cache[query]
+
+        pending = [query for query in dict.fromkeys(queries) if query not in rankings]
+        dense_queries = [query for query in pending if self._needs_dense(query)]
+        dense_rankings = {}
+        if dense_queries:
+            depth = self.top_k if self.lexical_index is None else 4 * self.top_k
+            dense_rankings = dict(zip(dense_queries, self._dense_rankings(dense_queries, depth)))
+
+        for query in pending:
+            rankings[query] = self._rank(query, dense_rankings.get(query))
+            if self.cache_size:
+                self.rank_cache[query] = rankings[query]
+                if len(self.rank_cache) > self.cache_size:
+                    self.rank_cache.popitem(last=False)
+        return [list(rankings[query]) for query in queries]
+
+    def _needs_dense(self, query):
+        if self.lexical_index is None:
+            return True
+        return self.retrieval_mode != "lexical" and self.entity_table.match(query) is None
+
+    def _rank(self, query, dense_ranking=None):
+        if self.lexical_index is None:
+            return dense_ranking[: self.top_k]
+
+        title_idx = self.entity_table.match(query)
+        if title_idx is not None or self.retrieval_mode == "lexical":
+            # Entity-name queries are answered lexically; the embedding model is never touched.
+            ranking = [doc_idx for doc_idx, _ in self.lexical_index.search(query, self.top_k)]
+            if title_idx is not None:
+                ranking = [title_idx] + [doc_idx for doc_idx in ranking if doc_idx != title_idx]
+            return ranking[: self.top_k]
+
+        lexical_ranking = [doc_idx for doc_idx, _ in self.lexical_index.search(query, 4 * self.top_k)]
+        return reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=self.rrf_k)[: self.top_k]
+
+    def _dense_rankings(self, queries, top_k):
+        query_embeddings = self.model.encode(queries).astype(np.float32)
+        _, indices = self.index.search(query_embeddings, top_k)
+        return [[int(idx) for idx in row if idx >= 0] for row in indices]
@@ -0,0 +1,119 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from balrog.environments import make_env
+from balrog.environments.nle import NLELanguageWrapper
+from balrog.utils import load_config
+
+TASKS = [("nle", "NetHackChallenge-v0"), ("minihack", "MiniHack-Room-5x5-v0")]
+
+
+def legacy_map_render(chars):
+    """The map rendering of `render_hybrid` before it was vectorized, for comparison."""
+    rows, cols = chars.shape
+    result = ""
+    for i in range(rows):
+        for j in range(cols):
+            entry = chr(chars[i, j])
+            result += entry
+        result += "\n"
+    return "\n".join(result.split("\n")[1:])
+
+
+def language_wrapper(env):
+    """Return the `NLELanguageWrapper` inside the wrappers added by `make_env`."""
+    while not isinstance(env, NLELanguageWrapper):
+        env = env.env
+    return env
+
+
+def collect_observations(env_name, task, steps, seed):
+    """Play random actions and keep a copy of every raw NLE observation.
+
+    Returns:
+        tuple: The language wrapper of the environment, and the raw observations.
+    """
+    # Following "--More--" prompts would step the environment while converting the observation
+    config = load_config([f"envs.{env_name}_kwargs.skip_more=True"])
+    env = make_env(env_name, task, config)
+    wrapper = language_wrapper(env)
+    # The language action space also lists letters and numbers, which only answer in-game prompts
+    actions = [wrapper.get_text_action(action) for action in range(wrapper.env.action_space.n)]
+    rng = random.Random(seed)
+    env.reset(seed=seed)
+    observations = []
+    while len(observations) < steps:
+        obs, reward, terminated, truncated, info = env.step(rng.choice(actions))
+        # NLE updates its observation arrays in place
+        observations.append({key: np.copy(value) for key, value in obs["obs"].items()})
+        if terminated or truncated:
+            env.reset(seed=rng.randrange(2**31))
+    return wrapper, observations
+
+
+def time_per_step(function, observations):
+    """Median time of `function` over the observations, in microseconds."""
+    timings = []
+    for nle_obsv in observations:
+        start = time.perf_counter()
+        function(nle_obsv)
+        timings.append(1e6 * (time.perf_counter() - start))
+    return float(np.median(timings))
+
+
+def read_prompt_text(text):
+    """Read the fields of a text observation that the prompt builder uses, computing them."""
+    return text["long_term_context"], text["short_term_context"]
+
+
+def run_task(env_name, task, steps, seed):
+    wrapper, observations = collect_observations(env_name, task, steps, seed)
+    return {
+        "task": task,
+        "steps": len(observations),
+        "map_before_us": time_per_step(lambda obs: legacy_map_render(obs["tty_chars"]), observations),
+        "map_after_us": time_per_step(lambda obs: wrapper.ascii_render(obs["tty_chars"][1:]), observations),
+        "observation_us": time_per_step(lambda obs: read_prompt_text(wrapper.nle_obsv_type(obs)), observations),
+    }
+
+
+def format_report(results):
+    lines = [f"{'task':<24}{'map before (us)':>18}{'map after (us)':>18}{'speedup':>10}{'full obs (us)':>16}"]
+    for result in results:
+        speedup = result["map_before_us"] / result["map_after_us"]
+        lines.append(
+            f"{result['task']:<24}{result['map_before_us']:>18.1f}{result['map_after_us']:>18.1f}"
+            f"{speedup:>9.1f}x{result['observation_us']:>16.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the per-step conversion of NLE observations to the text read by the agents."
+    )
+    parser.add_argument(
+        "--task",
+        nargs=2,
+        action="append",
+        metavar=("ENV_NAME", "TASK"),
+        help="An environment and task, e.g. `nle NetHackChallenge-v0`. Can be repeated. Defaults to NLE and MiniHack.",
+    )
+    parser.add_argument("--steps", type=int, default=500, help="Number of observations to convert per task.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    results = [run_task(env_name, task, args.steps, args.seed) for env_name, task in args.task or TASKS]
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import re
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from balrog.retrieval import NethackWikiSearch
+from balrog.utils import load_config
+
+# "2025-01-01 12:00:00,000 - INFO - RAG query: how to escape a soldier ant"
+RAG_QUERY_PATTERN = re.compile(r" - INFO - RAG query: (?P<query>.+)$")
+
+BATCH_SIZES = [1, 4, 16, 64, 256]
+
+
+def harvest_queries(log_paths):
+    """Collect the LLM-generated RAG queries logged by the RAG agents.
+
+    Args:
+        log_paths (list): Paths or glob patterns of `eval.log` files.
+
+    Returns:
+        list: Queries in log order, duplicates included, as they were issued during the episodes.
+    """
+    queries = []
+    for pattern in log_paths:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    match = RAG_QUERY_PATTERN.search(line.rstrip("\n"))
+                    if match:
+                        queries.append(match.group("query").strip())
+    return queries
+
+
+def load_labeled_queries(path):
+    """Load a labeled query file.
+
+    Each line is a JSON object with a `query` and the `relevant` article titles (or chunk ids).
+    """
+    labeled = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                labeled.append((item["query"], set(item["relevant"])))
+    return labeled
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_latency(search, queries):
+    """Time `search.search` once per query, in milliseconds."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search.search(query)
+        latencies.append(1000 * (time.perf_counter() - start))
+    return latencies
+
+
+def measure_throughput(search, queries, batch_size):
+    """Queries per second when queries are answered `batch_size` at a time with `search_many`, from a cold cache."""
+    search.rank_cache.clear()
+    batches = [queries[start : start + batch_size] for start in range(0, len(queries), batch_size)]
+    start = time.perf_counter()
+    for batch in batches:
+        search.search_many(batch)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def measure_quality(search, labeled, k):
+    """Recall@k and MRR of `search.rank` over labeled queries.
+
+    A retrieved document is relevant if its id or its article title is among the labels, so the
+    same query file works for article and chunk stores.
+    """
+    search.rank_cache.clear()
+    recalls = []
+    reciprocal_ranks = []
+    for query, relevant in labeled:
+        ranking = search.rank(query)[:k]
+        hits = [
+            rank
+            for rank, idx in enumerate(ranking)
+            if search.doc_ids[idx] in relevant or search.doc_titles[idx] in relevant
+        ]
+        found = {search.doc_titles[ranking[rank]] for rank in hits} | {search.doc_ids[ranking[rank]] for rank in hits}
+        recalls.append(len(found & relevant) / len(relevant))
+        reciprocal_ranks.append(1.0 / (hits[0] + 1) if hits else 0.0)
+    return float(np.mean(recalls)), float(np.mean(reciprocal_ranks))
+
+
+def run_variant(name, overrides, queries, labeled, batch_sizes, warmup=8):
+    """Benchmark one index, embedding model and cache configuration.
+
+    Peak memory is that of the whole process, so each variant should run in a fresh process,
+    see `run_isolated`.
+
+    Args:
+        name (str): Label of the variant in the report.
+        overrides (list): Config overrides, e.g. `["agent.retrieval_mode=dense"]`.
+        queries (list): Queries to replay.
+        labeled (list): `(query, relevant)` pairs, possibly empty.
+        batch_sizes (list): Batch sizes to measure throughput at.
+        warmup (int, optional): Queries issued before timing, so model loading is not measured. Defaults to 8.
+
+    Returns:
+        dict: The measurements.
+    """
+    config = load_config(overrides)
+    memory_before = peak_memory_mb()
+    load_start = time.perf_counter()
+    search = NethackWikiSearch(config)
+    search.load_index()
+    for query in queries[:warmup]:
+        search.search(query)
+    load_seconds = time.perf_counter() - load_start
+    # Includes the embedding model, which may only be loaded by the first searches
+    load_memory_mb = peak_memory_mb() - memory_before
+    search.rank_cache.clear()
+
+    latencies = measure_latency(search, queries)
+    result = {
+        "variant": name,
+        "overrides": list(overrides),
+        "num_queries": len(queries),
+        "load_seconds": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput_qps": {
+            batch_size: measure_throughput(search, queries, batch_size)
+            for batch_size in batch_sizes
+            if batch_size <= len(queries)
+        },
+        "peak_memory_mb": peak_memory_mb(),
+        "load_memory_mb": load_memory_mb,
+    }
+    if labeled:
+        result["recall_at_k"], result["mrr"] = measure_quality(search, labeled, config.agent.top_k)
+    return result
+
+
+def run_isolated(*args):
+    """Run `run_variant` in a new process, so its memory is not mixed with the other variants'."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_variant, *args).result()
+
+
+def format_report(results):
+    """Render the benchmark results as a plain-text table."""
+    lines = []
+    for result in results:
+        lines.append(f"== {result['variant']} ({' '.join(result['overrides']) or 'defaults'})")
+        lines.append(
+            f"  queries: {result['num_queries']}  load: {result['load_seconds']:.2f}s  "
+            f"p50: {result['p50_ms']:.2f}ms  p99: {result['p99_ms']:.2f}ms"
+        )
+        throughput = "  ".join(f"b{size}: {qps:.1f}/s" for size, qps in result["throughput_qps"].items())
+        lines.append(f"  throughput: {throughput}")
+        lines.append(f"  memory: {result['peak_memory_mb']:.0f}MB peak (+{result['load_memory_mb']:.0f}MB at load)")
+        if "mrr" in result:
+            lines.append(f"  recall@k: {result['recall_at_k']:.3f}  MRR: {result['mrr']:.3f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NetHack wiki retrieval offline.")
+    parser.add_argument(
+        "--logs", nargs="*", default=[], help="eval.log files or glob patterns to harvest queries from."
+    )
+    parser.add_argument("--queries", default=None, help="Labeled JSONL query file with `query` and `relevant`.")
+    parser.add_argument(
+        "--variant",
+        nargs="+",
+        action="append",
+        metavar=("NAME", "OVERRIDE"),
+        help="A named configuration followed by config overrides. Can be repeated. Defaults to the config as is.",
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many queries.")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    labeled = load_labeled_queries(args.queries) if args.queries else []
+    queries = harvest_queries(args.logs) + [query for query, _ in labeled]
+    if args.limit:
+        queries = queries[: args.limit]
+    if not queries:
+        parser.error("No queries found. Pass --logs and/or --queries.")
+
+    variants = args.variant or [["default"]]
+    results = [run_isolated(variant[0], variant[1:], queries, labeled, args.batch_sizes) for variant in variants]
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+
+import numpy as np
+from nle import nethack, nle_language_obsv
+
+from balrog.retrieval import NethackWikiSearch
+from balrog.retrieval.lexical import normalize_title
+from balrog.retrieval.observation import glyph_entities
+from balrog.utils import load_config
+
+# Object classes in NetHack's `objclass` order, named after their wiki articles.
+OBJECT_CLASS_NAMES = [
+    "weapon",
+    "armor",
+    "ring",
+    "amulet",
+    "tool",
+    "comestible",
+    "potion",
+    "scroll",
+    "spellbook",
+    "wand",
+    "gold piece",
+    "gem",
+    "boulder",
+    "iron ball",
+    "iron chain",
+    "venom",
+]
+
+
+def describe_glyphs():
+    """Name every NLE glyph exactly as the language observation renders it.
+
+    Each glyph is placed next to the player on an empty map and described with
+    `nle_language_obsv`, so the names match what `observation_queries` extracts at runtime.
+
+    Returns:
+        set: Entity names.
+    """
+    language = nle_language_obsv.NLELanguageObsv()
+    rows, cols = nethack.DUNGEON_SHAPE
+    x, y = cols // 2, rows // 2
+    blstats = np.zeros(nethack.BLSTATS_SHAPE, dtype=np.int64)
+    blstats[0], blstats[1] = x, y
+
+    names = set()
+    for glyph in range(nethack.MAX_GLYPH):
+        glyphs = np.full((rows, cols), nethack.GLYPH_CMAP_OFF, dtype=np.int16)
+        glyphs[y, x + 1] = glyph
+        text = language.text_glyphs(glyphs, blstats).decode("latin-1")
+        names.update(glyph_entities("\n".join(line for line in text.split("\n") if line.endswith("adjacent east"))))
+    return names
+
+
+def build_glyph_lookup(config, output_path):
+    """Map every glyph and object class name to its top wiki passages.
+
+    Args:
+        config (omegaconf.DictConfig): Configuration with the wiki index settings under `agent`.
+        output_path (str): Where to write the lookup table.
+
+    Returns:
+        dict: The lookup table.
+    """
+    search = NethackWikiSearch(config)
+    search.load_index()
+
+    entities = {}
+    for name in sorted(describe_glyphs() | set(OBJECT_CLASS_NAMES)):
+        key = normalize_title(name)
+        if key and key not in entities:
+            entities[key] = [search.doc_ids[idx] for idx in search.rank(name)]
+
+    lookup = {"top_k": search.top_k, "entities": entities}
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(lookup, f, separators=(",", ":"))
+    return lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the wiki passages for every NLE glyph name.")
+    parser.add_argument("--output", default=None, help="Defaults to agent.nethack_wiki_glyph_lookup.")
+    parser.add_argument("overrides", nargs="*", help="Config overrides, e.g. agent.top_k=5")
+    args = parser.parse_args()
+
+    config = load_config(args.overrides)
+    output_path = args.output or config.agent.nethack_wiki_glyph_lookup
+    lookup = build_glyph_lookup(config, output_path)
+    print(f"Wrote passages for {len(lookup['entities'])} entities to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+
+from balrog.retrieval.chunking import chunk_article
+from balrog.retrieval.lexical import BM25Index
+
+
+def build_lexical_index(store_path, output_path, title_weight=3):
+    """Build the BM25 index for the wiki document store.
+
+    Documents are indexed in document store order, which is the order used by the FAISS index.
+
+    Args:
+        store_path (str): Path to the processed wiki document store.
+        output_path (str): Where to write the lexical index.
+        title_weight (int, optional): How many times title tokens are counted. Defaults to 3.
+
+    Returns:
+        BM25Index: The built index.
+    """
+    with open(store_path, "r", encoding="utf-8") as f:
+        doc_store = json.load(f)
+    doc_store.pop("_global_counts", None)
+
+    index = BM25Index.build(
+        [(title, doc["raw_text"]) for title, doc in doc_store.items()],
+        title_weight=title_weight,
+    )
+    index.save(output_path)
+    return index
+
+
+def build_chunk_store(store_path, output_path, max_tokens=256):
+    """Split every article of the wiki document store into token-bounded chunks.
+
+    Chunks of one article are written contiguously and in order, so that neighbouring chunks
+    can be merged back together at retrieval time.
+
+    Args:
+        store_path (str): Path to the processed wiki document store.
+        output_path (str): Where to write the chunk store.
+        max_tokens (int, optional): Maximum estimated tokens per chunk. Defaults to 256.
+
+    Returns:
+        list: The chunks.
+    """
+    with open(store_path, "r", encoding="utf-8") as f:
+        doc_store = json.load(f)
+    doc_store.pop("_global_counts", None)
+
+    chunks = []
+    for title, doc in doc_store.items():
+        chunks.extend(chunk_article(title, doc["raw_text"], max_tokens=max_tokens))
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"max_tokens": max_tokens, "chunks": chunks}, f, separators=(",", ":"))
+    return chunks
+
+
+def build_chunk_indexes(chunks, faiss_path, lexical_path, embedding_model, title_weight=3):
+    """Build the FAISS and BM25 indexes over a chunk store.
+
+    Args:
+        chunks (list): Chunks returned by `build_chunk_store`.
+        faiss_path (str): Where to write the FAISS index.
+        lexical_path (str): Where to write the BM25 index.
+        embedding_model (str): Sentence transformer used to embed the chunks.
+        title_weight (int, optional): How many times title tokens are counted. Defaults to 3.
+
+    Returns:
+        BM25Index: The lexical index.
+    """
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(embedding_model)
+    embeddings = model.encode([chunk["text"] for chunk in chunks], show_progress_bar=True).astype(np.float32)
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    faiss.write_index(index, faiss_path)
+
+    lexical_index = BM25Index.build(
+        [(chunk["title"], chunk["text"]) for chunk in chunks],
+        doc_ids=[chunk["id"] for chunk in chunks],
+        title_weight=title_weight,
+    )
+    lexical_index.save(lexical_path)
+    return lexical_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the lexical index used for hybrid NetHack wiki retrieval.")
+    parser.add_argument("--store", default="processed_wiki_self.json", help="Path to the processed wiki store.")
+    parser.add_argument("--output", default="wiki_bm25.json", help="Where to write the BM25 index.")
+    parser.add_argument("--title-weight", type=int, default=3, help="How many times title tokens are counted.")
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=None,
+        help="If set, index token-bounded chunks of at most this size instead of whole articles.",
+    )
+    parser.add_argument("--chunk-store", default="wiki_chunks.json", help="Where to write the chunk store.")
+    parser.add_argument("--chunk-index", default="wiki_chunks.faiss", help="Where to write the chunk FAISS index.")
+    parser.add_argument(
+        "--embedding-model", default="all-MiniLM-L6-v2", help="Sentence transformer used to embed the chunks."
+    )
+    args = parser.parse_args()
+
+    if args.chunk_tokens is None:
+        index = build_lexical_index(args.store, args.output, title_weight=args.title_weight)
+        print(f"Indexed {len(index.titles)} documents and {len(index.postings)} terms into {args.output}")
+        return
+
+    chunks = build_chunk_store(args.store, args.chunk_store, max_tokens=args.chunk_tokens)
+    index = build_chunk_indexes(
+        chunks, args.chunk_index, args.output, args.embedding_model, title_weight=args.title_weight
+    )
+    print(
+        f"Indexed {len(index.titles)} chunks and {len(index.postings)} terms into {args.chunk_index} and {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
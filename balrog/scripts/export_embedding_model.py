@@ -0,0 +1,143 @@
+import argparse
+import sys
+
+import numpy as np
+
+from balrog.retrieval import NethackWikiSearch
+from balrog.retrieval.embedding import OnnxEncoder, SentenceTransformerEncoder, hub_name, int8_path
+from balrog.utils import load_config
+
+# Queries in the style of the RAG agents, used when no query file is given.
+SAMPLE_QUERIES = [
+    "how to deal with a floating eye",
+    "cockatrice",
+    "what does Elbereth do",
+    "I am hungry and have a lichen corpse",
+    "wand of digging",
+    "how to escape from a soldier ant",
+    "You feel feverish.",
+    "should I pray when my HP is low",
+]
+
+
+def export_onnx(model_name, output_path, opset=14):
+    """Export the transformer of a sentence transformer model to ONNX.
+
+    Only the encoder is exported; mean pooling and normalization are done by `OnnxEncoder`.
+
+    Args:
+        model_name (str): Sentence transformer name or path.
+        output_path (str): Where to write the ONNX model.
+        opset (int, optional): ONNX opset version. Defaults to 14.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(hub_name(model_name))
+    model = AutoModel.from_pretrained(hub_name(model_name)).eval()
+    inputs = tokenizer(SAMPLE_QUERIES[:2], padding=True, return_tensors="pt")
+    input_names = list(inputs.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(inputs[name] for name in input_names),
+            output_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+
+def quantize_int8(onnx_path):
+    """Write a dynamically int8-quantized copy of an ONNX model next to it.
+
+    Returns:
+        str: Path of the quantized model.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = int8_path(onnx_path)
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+    return output_path
+
+
+def check_equivalence(reference, candidate, queries, index, top_k=5):
+    """Compare a candidate encoder against the reference model on the wiki FAISS index.
+
+    Args:
+        reference: Encoder producing the embeddings the FAISS index was built with.
+        candidate: Encoder under test.
+        queries (list): Queries to embed.
+        index (faiss.Index): The wiki index the queries are searched in.
+        top_k (int, optional): Number of retrieved documents compared per query. Defaults to 5.
+
+    Returns:
+        dict: Minimum and mean cosine similarity, and the mean fraction of the reference `top_k`
+            documents that the candidate also retrieves.
+    """
+    expected = reference.encode(queries)
+    actual = candidate.encode(queries)
+    cosine = (expected * actual).sum(axis=1) / (np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1))
+
+    _, expected_docs = index.search(expected, top_k)
+    _, actual_docs = index.search(actual, top_k)
+    overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(expected_docs, actual_docs)])
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean()), "topk_overlap": float(overlap)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the query embedding model to ONNX and check it.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence transformer to export.")
+    parser.add_argument("--output", default="all-MiniLM-L6-v2.onnx", help="Where to write the ONNX model.")
+    parser.add_argument("--int8", action="store_true", help="Also write a dynamically int8-quantized copy.")
+    parser.add_argument("--queries", default=None, help="Text file with one query per line to check equivalence on.")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Fail if any query falls below this.")
+    parser.add_argument(
+        "--min-overlap",
+        type=float,
+        default=0.9,
+        help="Fail if the mean fraction of the reference top-k wiki documents still retrieved falls below this.",
+    )
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime threads used for the check.")
+    parser.add_argument("overrides", nargs="*", help="Config overrides selecting the wiki index, e.g. agent.top_k=5")
+    args = parser.parse_args()
+
+    config = load_config(args.overrides)
+    search = NethackWikiSearch(config)
+    search.load_index()
+    if search.index is None:
+        parser.error("The equivalence check needs the FAISS index; use a dense or hybrid agent.retrieval_mode.")
+
+    export_onnx(args.model, args.output)
+    paths = [args.output]
+    if args.int8:
+        paths.append(quantize_int8(args.output))
+
+    queries = SAMPLE_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    reference = SentenceTransformerEncoder(args.model)
+    failed = False
+    for path in paths:
+        candidate = OnnxEncoder(path, args.model, threads=args.threads)
+        report = check_equivalence(reference, candidate, queries, search.index, top_k=search.top_k)
+        print(
+            f"{path}: min cosine {report['min_cosine']:.4f}, mean cosine {report['mean_cosine']:.4f}, "
+            f"top-{search.top_k} overlap {report['topk_overlap']:.2%}"
+        )
+        failed = failed or report["min_cosine"] < args.min_cosine or report["topk_overlap"] < args.min_overlap
+    if failed:
+        sys.exit(
+            f"Exported model is not equivalent to {args.model} "
+            f"(min cosine < {args.min_cosine} or top-k overlap < {args.min_overlap})."
+        )
+
+
+if __name__ == "__main__":
+    main()
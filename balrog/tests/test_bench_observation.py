@@ -0,0 +1,16 @@
+import pytest
+
+from balrog.scripts.bench_observation import collect_observations, run_task
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_collect_observations_plays_valid_actions(seed):
+    wrapper, observations = collect_observations("nle", "NetHackChallenge-v0", steps=20, seed=seed)
+    assert len(observations) == 20
+    assert observations[0]["tty_chars"].shape == (24, 80)
+
+
+def test_run_task_times_every_conversion():
+    result = run_task("nle", "NetHackChallenge-v0", steps=5, seed=0)
+    assert result["steps"] == 5
+    assert all(result[key] > 0 for key in ("map_before_us", "map_after_us", "observation_us"))
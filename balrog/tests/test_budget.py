@@ -0,0 +1,37 @@
+from omegaconf import OmegaConf
+
+from balrog.budget import EpisodeBudget, RunBudget
+
+
+def make_budget_config(episode=None, run=None, degrade_at=None):
+    limits = dict.fromkeys(["input_tokens", "output_tokens", "cost_usd", "seconds"])
+    return OmegaConf.create(
+        {"episode": {**limits, **(episode or {})}, "run": {**limits, **(run or {})}, "degrade_at": degrade_at}
+    )
+
+
+def test_episode_budget_degrades_then_stops():
+    budget = EpisodeBudget(make_budget_config(episode={"input_tokens": 1000}, degrade_at=0.8))
+
+    budget.update({"input_tokens": 700, "output_tokens": 10, "cost_usd": 0.0})
+    assert budget.running_low() is None
+    budget.update({"input_tokens": 850, "output_tokens": 20, "cost_usd": 0.0})
+    assert budget.running_low() == "episode input_tokens budget: 850 of 1000"
+    assert budget.exhausted() is None
+    budget.update({"input_tokens": 1200, "output_tokens": 30, "cost_usd": 0.0})
+    assert budget.exhausted() == "episode input_tokens budget: 1200 of 1000"
+
+
+def test_run_budget_is_shared_by_episodes():
+    config = make_budget_config(run={"cost_usd": 1.0})
+    run_budget = RunBudget(config)
+
+    first = EpisodeBudget(config, run_budget)
+    first.update({"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.5})
+    first.update({"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.75})
+    assert first.exhausted() is None
+
+    second = EpisodeBudget(config, run_budget)
+    second.update({"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.25})
+    assert second.exhausted() == "run cost_usd budget: 1 of 1"
+    assert run_budget.exhausted() is not None
@@ -0,0 +1,42 @@
+from balrog.cascade import CascadeClient
+from balrog.client import LLMClientWrapper, LLMResponse
+from balrog.prompt_builder.history import Message
+from balrog.utils import load_config
+
+
+class ScriptedClient(LLMClientWrapper):
+    """Returns the given completions in order."""
+
+    def __init__(self, client_config, completions):
+        super().__init__(client_config)
+        self.completions = list(completions)
+
+    def generate(self, messages):
+        self.ledger.record(self.model_id, 10, 2, 0.0)
+        return LLMResponse(self.model_id, self.completions.pop(0), "stop", 10, 2, None)
+
+
+def make_obs(language_observation):
+    return {"text": {"long_term_context": f"language observation:\n{language_observation}\n"}}
+
+
+def test_routine_steps_stay_on_the_cheap_model():
+    config = load_config(["client.model_id=strong", "client.cascade.model_id=cheap", "client.cascade.stall_steps=3"])
+    cheap = ScriptedClient(load_config(["client.model_id=cheap"]).client, ["east", "I am not sure, east", "east"])
+    strong = ScriptedClient(config.client, ["west", "west", "west"])
+    client = CascadeClient(config.client, cheap, strong)
+    prompt = [Message(role="user", content="Where to?")]
+
+    client.start_step(make_obs("newt far east"), progression=0.0)
+    assert client.generate(prompt).model_id == "cheap"
+    client.start_step(make_obs("newt far east"), progression=0.0)
+    assert client.generate(prompt).completion == "west"
+    client.start_step(make_obs("newt far east\njackal near west"), progression=0.0)
+    assert client.generate(prompt).model_id == "strong"
+    client.start_step(make_obs("newt far east\njackal near west"), progression=0.1)
+    assert client.generate(prompt).model_id == "cheap"
+
+    summary = client.summary()
+    assert summary["escalations"] == {"low confidence": 1, "new entity in view": 1}
+    assert summary["escalation_rate"] == 0.5
+    assert set(client.ledger.summary()["usage_by_model"]) == {"cheap", "strong"}
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from nle import nethack
+
+from balrog.environments.nle import render, render_rgb
+
+
+def sha256(array):
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def test_tile_assets_match_the_previous_tables():
+    # Digests of the glyph table that was inlined in render_rgb.py, of the atlas in tiles.pkl,
+    # and of the image they rendered for this grid
+    glyphs = (np.arange(21 * 79).reshape(21, 79) * 7) % nethack.MAX_GLYPH
+
+    assert render_rgb.glyph2tile.shape == (nethack.MAX_GLYPH,)
+    assert sha256(render_rgb.glyph2tile.astype(np.int64)) == (
+        "7f9e0972c260c3497931690eaea8d50c3967fdbdb92d50803a9d40b574ae251b"
+    )
+    assert render_rgb.DEFAULT_TEXTURE_ATLAS.shape == (1082, 16, 16, 3)
+    assert (
+        sha256(render_rgb.DEFAULT_TEXTURE_ATLAS) == "5ab942ca99b830b4b11848f6734fda2d27138df9440eb640aee46434b6b44a46"
+    )
+    image = render_rgb.rgb_render_image(glyphs)
+    assert image.shape == (21 * 16, 79 * 16, 3)
+    assert sha256(image) == "32478c4f029f16175eb10fda2d42187e5802bd19f2da055ad2c43ce3027b12fb"
+
+
+def test_importing_the_nle_environments_does_not_load_the_tiles():
+    script = """
+import numpy as np
+
+loaded = []
+np_load = np.load
+np.load = lambda path, *args, **kwargs: loaded.append(str(path)) or np_load(path, *args, **kwargs)
+
+import balrog.environments.nle
+
+print([path for path in loaded if path.endswith(("tiles.npy", "glyph2tile.npy"))])
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.fixture
+def atlas_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(render, "CACHE_DIR", str(tmp_path))
+    render.load_atlas.cache_clear()
+    yield tmp_path
+    render.load_atlas.cache_clear()
+
+
+def test_tty_atlas_is_read_back_from_the_cache(atlas_cache):
+    atlas = np.array(render.load_atlas())
+    path = render.atlas_cache_path()
+    assert os.listdir(atlas_cache) == [os.path.basename(path)]
+
+    render.load_atlas.cache_clear()
+    cached = render.load_atlas()
+    assert isinstance(cached, np.memmap)
+    assert np.array_equal(cached, atlas)
+
+
+def test_unreadable_tty_atlas_cache_is_rebuilt(atlas_cache):
+    path = render.atlas_cache_path()
+    with open(path, "wb") as f:
+        f.write(b"not an atlas")
+
+    atlas = render.load_atlas()
+    assert atlas.shape[0] == 4096
+    assert np.array_equal(np.load(path), atlas)
+
+
+def test_tty_atlas_is_used_from_memory_when_the_cache_cannot_be_written(atlas_cache, monkeypatch):
+    def save(file, array):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(render.np, "save", save)
+    atlas = render.load_atlas()
+    assert atlas.shape[0] == 4096
+    # The temporary file is removed
+    assert os.listdir(atlas_cache) == []
@@ -0,0 +1,78 @@
+import pickle
+
+import pytest
+
+from balrog.environments.observation import LazyObservation
+
+
+def counting(value):
+    """A factory that returns `value` and counts its calls in `factory.calls`."""
+
+    def factory():
+        factory.calls += 1
+        return value
+
+    factory.calls = 0
+    return factory
+
+
+def test_fields_are_computed_once_on_first_read():
+    image = counting("image")
+    obs = LazyObservation({"obs": "raw"}, image=image)
+    assert image.calls == 0
+    assert set(obs) == {"obs", "image"}
+    assert "image" in obs
+
+    assert obs["image"] == "image"
+    assert obs["image"] == "image"
+    assert obs.get("image") == "image"
+    assert image.calls == 1
+
+
+def test_setitem_overrides_a_pending_field():
+    image = counting("image")
+    obs = LazyObservation(image=image)
+    obs["image"] = None
+    assert obs["image"] is None
+    assert image.calls == 0
+    assert len(obs) == 1
+
+
+def test_expire_keeps_read_fields_and_fails_unread_ones():
+    obs = LazyObservation({"obs": "raw"}, text=counting("text"), image=counting("image"))
+    assert obs["text"] == "text"
+    obs.expire()
+
+    assert obs["text"] == "text"
+    assert obs["obs"] == "raw"
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="'image' was not read"):
+            obs["image"]
+    # The field is still there, it just cannot be computed
+    assert "image" in obs
+    with pytest.raises(RuntimeError):
+        obs.get("image")
+
+
+def test_failed_read_keeps_the_field():
+    def render():
+        raise ValueError("render failed")
+
+    obs = LazyObservation(image=render)
+    with pytest.raises(ValueError):
+        obs["image"]
+    assert "image" in obs
+    with pytest.raises(ValueError):
+        obs["image"]
+
+
+def test_pickle_computes_nested_fields():
+    text = LazyObservation(long_term_context=counting("map"), short_term_context=counting("inventory"))
+    obs = LazyObservation({"obs": {"blstats": [1, 2]}}, text=lambda: text, image=counting(None))
+    obs["text"]["long_term_context"] = "map with wiki passages"
+
+    loaded = pickle.loads(pickle.dumps(obs))
+    assert isinstance(loaded, LazyObservation)
+    assert dict(loaded["text"]) == {"long_term_context": "map with wiki passages", "short_term_context": "inventory"}
+    assert loaded["obs"] == {"blstats": [1, 2]}
+    assert loaded["image"] is None
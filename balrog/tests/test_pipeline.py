@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from balrog.agents import NaiveRAGAgent, PlanningAgent
+from balrog.client import LLMClientWrapper, LLMResponse
+from balrog.prompt_builder import create_prompt_builder
+from balrog.prompt_builder.history import Message, overlay
+from balrog.retrieval import BM25Index
+from balrog.utils import load_config
+
+DOCUMENTS = [
+    ("Newt", "The newt is a harmless early monster."),
+    ("Elbereth", "Engrave Elbereth in the dust to scare most monsters away."),
+]
+
+
+class ScriptedClient(LLMClientWrapper):
+    """Answers query, summary and action requests with fixed completions."""
+
+    def __init__(self, client_config):
+        super().__init__(client_config)
+        self.prompts = []
+
+    def generate(self, messages):
+        self.prompts.append(messages[-1].content)
+        if "Query: <query>" in messages[-1].content:
+            completion = "Query: newt"
+        elif "RAG Results:" in messages[-1].content:
+            completion = "Current State Summary: a newt is near"
+        else:
+            completion = "far east"
+        self.ledger.record(self.model_id, 10, 2, 0.0, cached_tokens=4)
+        return LLMResponse(self.model_id, completion, "stop", 10, 2, None)
+
+
+def make_obs(language_observation):
+    return {
+        "text": {
+            "long_term_context": f"language observation:\n{language_observation}\n",
+            "short_term_context": "cursor:\nYourself a valkyrie\n",
+        },
+        "image": None,
+    }
+
+
+def test_rag_stages_are_reused_until_the_situation_changes(tmp_path):
+    (tmp_path / "store.json").write_text(json.dumps({title: {"raw_text": text} for title, text in DOCUMENTS}))
+    BM25Index.build(DOCUMENTS).save(tmp_path / "bm25.json")
+    config = load_config(
+        [
+            "agent.retrieval_mode=lexical",
+            f"agent.nethack_wiki_store={tmp_path / 'store.json'}",
+            f"agent.nethack_wiki_lexical_index={tmp_path / 'bm25.json'}",
+            "agent.nethack_wiki_glyph_lookup=null",
+            "agent.rag_trigger=on_change",
+            "client.model_id=scripted",
+            "client.prices.scripted={input: 1.0, cached_input: 0.5, output: 2.0}",
+        ]
+    )
+    client = ScriptedClient(config.client)
+    agent = NaiveRAGAgent(lambda: client, create_prompt_builder(config.agent), config)
+
+    agent.act(make_obs("newt far east"))
+    response = agent.act(make_obs("newt far east"), prev_action="far east")
+    agent.act(make_obs("newt far east\njackal near west"), prev_action="far east")
+
+    assert response.completion == "far east"
+    assert agent.stage_stats["summary"]["calls"] == 2
+    assert agent.stage_stats["summary"]["cache_hits"] == 1
+    assert agent.stage_stats["action"]["calls"] == 3
+    usage = client.ledger.summary()
+    assert usage["usage_by_stage"]["query"]["input_tokens"] == 20
+    assert usage["usage_by_stage"]["action"]["calls"] == 3
+    assert usage["cached_tokens"] == 28
+    assert usage["cost_usd"] == pytest.approx(7 * (6 * 1.0 + 4 * 0.5 + 2 * 2.0) / 1e6)
+    assert "The newt is a harmless early monster." in client.prompts[1]
+
+    agent.reset()
+    assert agent.stage_stats == {}
+
+    agent.degrade()
+    agent.act(make_obs("newt far east"))
+    assert client.ledger.records[-1]["stage"] == "action"
+    assert len(client.ledger.records) == 8
+    assert "RAG" not in client.prompts[-1]
+
+
+def test_overlay_shares_the_prompt_without_modifying_it():
+    image = object()
+    prompt = [Message(role="user", content="Rules"), Message(role="user", content="Observation", attachment=image)]
+
+    query_prompt = overlay(prompt, "Ask a query.")
+
+    assert [message.content for message in prompt] == ["Rules", "Observation"]
+    assert query_prompt[0] is prompt[0]
+    assert query_prompt[1].content == "Observation\n\nAsk a query."
+    assert query_prompt[1].attachment is image
+    with pytest.raises(AttributeError):
+        prompt[1].content += "more"
+
+
+class PlanningClient(LLMClientWrapper):
+    """Always plans three moves east."""
+
+    def generate(self, messages):
+        self.ledger.record(self.model_id, 10, 2, 0.0)
+        return LLMResponse(self.model_id, "<|PLAN|>far east; far east; far east<|END|>", "stop", 10, 2, None)
+
+
+def test_plan_is_executed_until_something_unexpected_happens():
+    config = load_config(["agent.max_plan_length=3"])
+    client = PlanningClient(config.client)
+    agent = PlanningAgent(lambda: client, create_prompt_builder(config.agent), config)
+
+    first = agent.act(make_obs("newt far east"))
+    second = agent.act(make_obs("newt far east"), prev_action=first.completion)
+    agent.on_invalid_action(second.completion)
+    agent.act(make_obs("newt far east"), prev_action=second.completion)
+    agent.act(make_obs("newt far east\njackal near west"), prev_action="far east")
+
+    assert (first.completion, first.input_tokens) == ("far east", 10)
+    assert (second.completion, second.input_tokens) == ("far east", 0)
+    assert second.reasoning == "<|PLAN|>far east; far east; far east<|END|>"
+    assert agent.stage_stats["plan"]["calls"] == 3
+    assert agent.stage_stats["plan"]["cache_hits"] == 1
@@ -0,0 +1,141 @@
+from PIL import Image
+
+from balrog.prompt_builder.history import HistoryPromptBuilder
+from balrog.prompt_builder.images import EncodedImage
+from balrog.prompt_builder.memory import ExtractiveMemory
+
+
+def make_obs(step, image=None):
+    return {"text": {"long_term_context": f"obs {step}", "short_term_context": f"cursor {step}"}, "image": image}
+
+
+def test_history_window_slides_without_modifying_events():
+    builder = HistoryPromptBuilder(max_history=2, max_image_history=1, max_cot_history=1, system_prompt="rules")
+    images = [Image.new("RGB", (8, 8), color) for color in ("red", "green", "blue")]
+    for step, image in enumerate(images):
+        if step:
+            builder.update_reasoning(f"plan {step}")
+            builder.update_action(f"action {step}")
+        builder.update_observation(make_obs(step, image))
+
+    prompt = builder.get_prompt()
+
+    assert [message.content for message in prompt] == [
+        "rules",
+        "action 1",
+        "Observation:\nobs 1",
+        "Previous plan:\nplan 2",
+        "Current Observation:\ncursor 2\nobs 2\nImage observation provided.",
+    ]
+    assert [message.attachment for message in prompt[:-1]] == [None, None, None, None]
+    assert isinstance(prompt[-1].attachment, EncodedImage) and prompt[-1].attachment.size == (8, 8)
+    # Events that left the reasoning window keep it, images that left the image window are dropped
+    assert builder._events[0]["reasoning"] == "plan 1"
+    assert builder._events[1]["image"] is None
+    assert builder.get_prompt()[1] is prompt[1]
+
+
+def make_nle_text(message, ascii_map):
+    return {
+        "long_term_context": f"message:\n{message}\n\nlanguage observation:\nnewt far east\n\nmap:\n{ascii_map}\n",
+        "short_term_context": "inventory:\na: a long sword\n",
+        "map": ascii_map,
+    }
+
+
+def test_delta_encoding_shows_the_full_map_only_for_the_current_observation():
+    builder = HistoryPromptBuilder(max_history=4, history_encoding="delta")
+    maps = ["|..@.|\n|....|", "|...@|\n|....|", "|...@|\n|....|"]
+    messages = ["Hello", "Hello", "You hear a door open."]
+    for step, (message, ascii_map) in enumerate(zip(messages, maps)):
+        if step:
+            builder.update_action("east")
+        builder.update_observation({"text": make_nle_text(message, ascii_map), "image": None})
+
+    prompt = [message.content for message in builder.get_prompt()]
+
+    assert prompt[0].endswith("map: (omitted)\n")
+    assert prompt[2] == 'Observation:\n(same as the previous observation)\nmap changes:\ny=0 x=3-4: ".@" (was "@.")\n'
+    assert "You hear a door open." in prompt[4] and "|...@|\n|....|" in prompt[4]
+
+
+def test_extractive_memory_summarizes_evicted_steps():
+    builder = HistoryPromptBuilder(max_history=1, system_prompt="rules", memory=ExtractiveMemory())
+    messages = ["Hello", "You find a fountain.", "You hear a door open."]
+    for step, message in enumerate(messages):
+        if step:
+            builder.update_action("east")
+        builder.update_observation({"text": make_nle_text(message, "|.@..|\nDlvl:1"), "image": None})
+
+    prompt = [message.content for message in builder.get_prompt()]
+
+    assert prompt[1] == (
+        "Summary of the earlier steps:\n"
+        "Steps before the history below: 1\n"
+        "Dungeon levels visited: 1\n"
+        "Recent messages: Hello | You find a fountain.\n"
+        "Seen, most recent last: newt\n"
+        "Most frequent actions: east x1"
+    )
+    assert prompt[2:] == ["east", builder.get_prompt()[-1].content]
+    builder.reset()
+    assert len(builder.get_prompt()) == 1
+
+
+def test_repeated_steps_collapse_into_one_entry():
+    builder = HistoryPromptBuilder(max_history=2, collapse_repeats=True)
+    builder.update_observation(make_obs(0))
+    for step, action in enumerate(["search"] * 4 + ["north"], start=1):
+        builder.update_action(action)
+        builder.update_observation(make_obs(0 if action == "search" else step))
+
+    prompt = [message.content for message in builder.get_prompt()]
+
+    assert prompt == [
+        "search (repeated 4 times)",
+        "Observation:\nobs 0",
+        "north",
+        "Current Observation:\ncursor 5\nobs 5",
+    ]
+
+
+def test_block_layout_keeps_the_prompt_prefix_stable():
+    builder = HistoryPromptBuilder(max_history=2, system_prompt="rules", prompt_layout="blocks", history_block_size=2)
+    prompts = []
+    for step in range(8):
+        if step:
+            builder.update_action(f"action {step}")
+        builder.update_observation(make_obs(step))
+        prompts.append(builder.get_prompt())
+
+    # Two steps are dropped at once, whenever the history would hold more than 2 + 2 steps
+    assert [len(prompt) for prompt in prompts] == [2, 4, 6, 8, 6, 8, 6, 8]
+    for previous, prompt in zip(prompts, prompts[1:]):
+        if len(prompt) > len(previous):
+            assert [m.content for m in prompt[: len(previous) - 1]] == [m.content for m in previous[:-1]]
+    assert prompts[-1][1].content == "Observation:\nobs 4"
+    assert [index for index, message in enumerate(prompts[-1]) if message.cache_prefix] == [0, 4, 6]
+
+
+def test_block_layout_cache_prefixes_survive_the_image_and_reasoning_windows():
+    builder = HistoryPromptBuilder(max_history=2, system_prompt="rules", prompt_layout="blocks", history_block_size=2)
+    colors = ["red", "green", "blue", "white", "black", "yellow", "cyan", "magenta"]
+    prompts = []
+    for step, color in enumerate(colors):
+        if step:
+            builder.update_reasoning(f"plan {step}")
+            builder.update_action(f"action {step}")
+        builder.update_observation(make_obs(step, Image.new("RGB", (8, 8), color)))
+        prompts.append(builder.get_prompt())
+
+    def serialized(messages):
+        return [(m.role, m.content, m.attachment.png if m.attachment else None) for m in messages]
+
+    for previous, prompt in zip(prompts, prompts[1:]):
+        if len(prompt) < len(previous):
+            continue  # A block was dropped
+        ends = [index + 1 for index, message in enumerate(previous) if message.cache_prefix]
+        for end in ends:
+            assert serialized(prompt[:end]) == serialized(previous[:end])
+    # The previous step is shown with its reasoning, which is replaced by its action at the next step
+    assert [index for index, message in enumerate(prompts[-1]) if message.cache_prefix] == [0, 4, 5]
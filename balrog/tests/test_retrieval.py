@@ -0,0 +1,226 @@
+import json
+import multiprocessing
+
+import faiss
+import numpy as np
+import pytest
+
+from balrog.retrieval import BM25Index, ChangeDetector, NethackWikiSearch, RetrievalServer, reciprocal_rank_fusion
+from balrog.retrieval.chunking import chunk_article, estimate_tokens
+from balrog.retrieval.embedding import create_encoder, int8_path
+from balrog.retrieval.observation import observation_queries
+from balrog.scripts.export_embedding_model import check_equivalence
+from balrog.utils import load_config
+
+DOCUMENTS = [
+    ("Cockatrice", "A cockatrice can turn you to stone. Never touch a cockatrice corpse without gloves."),
+    ("Elbereth", "Engrave Elbereth in the dust to scare most monsters away."),
+    ("Wand of digging", "Zap a wand of digging downwards to escape to the next level."),
+    ("Newt", "The newt is a harmless early monster."),
+]
+
+
+def test_bm25_ranks_exact_entity_first():
+    index = BM25Index.build(DOCUMENTS)
+    ranking = [doc_idx for doc_idx, _ in index.search("how to use a wand of digging", top_k=2)]
+    assert ranking[0] == 2
+
+
+def test_bm25_title_match_handles_case_and_plurals():
+    index = BM25Index.build(DOCUMENTS)
+    assert index.match_title("elbereth") == 1
+    assert index.match_title("Cockatrices") == 0
+    assert index.match_title("wands of digging") == 2
+    assert index.match_title("escape downwards") is None
+
+
+def test_bm25_round_trip(tmp_path):
+    index = BM25Index.build(DOCUMENTS)
+    path = tmp_path / "bm25.json"
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.titles == index.titles
+    assert loaded.search("stone gloves", top_k=1) == index.search("stone gloves", top_k=1)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([[3, 1, 2], [1, 0, 3]])[:2] == [1, 3]
+
+
+def test_observation_queries_extract_entities_from_sections():
+    obs = {
+        "text": {
+            "long_term_context": "message:\nThe newt bites!\n\nlanguage observation:\n"
+            "dark area far east\ntame kitten adjacent south\nnewt very near west\n\ncursor:\nYourself a valkyrie\n",
+            "short_term_context": "inventory:\na: a +1 long sword (weapon in hand)\nb: 2 uncursed food rations\n",
+        }
+    }
+    message, entities = observation_queries(obs)
+    assert message == "The newt bites!"
+    assert entities == ["kitten", "newt", "long sword", "food rations"]
+
+
+def test_entity_table_links_names_in_messages():
+    index = BM25Index.build(DOCUMENTS)
+    assert index.entities.link("You write Elbereth in the dust. A cockatrice hisses!") == [1, 0]
+
+
+def test_change_detector_ignores_plain_movement():
+    def obs(glyphs, message=""):
+        return {"text": {"long_term_context": f"message:\n{message}\n\nlanguage observation:\n{glyphs}\n"}}
+
+    detector = ChangeDetector(max_reuse=2)
+    assert detector.update(obs("newt far east"))
+    assert not detector.update(obs("newt near east"))
+    assert detector.update(obs("newt near east\njackal far west"))
+    assert detector.update(obs("newt adjacent east", message="The newt bites!"))
+    assert not detector.update(obs("newt adjacent east", message="The newt bites!"))
+    assert not detector.update(obs("newt adjacent east"))
+    assert detector.update(obs("newt adjacent east"))
+
+
+def test_chunk_article_respects_token_limit():
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 30 for i in range(10))
+    chunks = chunk_article("Newt", text, max_tokens=64)
+    assert [chunk["id"] for chunk in chunks] == [f"Newt#{i}" for i in range(len(chunks))]
+    assert all(chunk["tokens"] <= 64 for chunk in chunks)
+    assert all(estimate_tokens(chunk["text"]) == chunk["tokens"] for chunk in chunks)
+
+
+def test_get_texts_merges_neighbouring_chunks_within_budget():
+    search = NethackWikiSearch(load_config(["agent.rag_token_budget=30"]))
+    search.chunked = True
+    search.doc_ids = ["Newt#0", "Newt#1", "Newt#2", "Elbereth#0"]
+    search.doc_titles = ["Newt", "Newt", "Newt", "Elbereth"]
+    search.doc_texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 40]
+    search.doc_tokens = [10, 10, 10, 10]
+
+    # Newt#1 and Elbereth#0 fit; the leftover 10 tokens pull in Newt#2, which is merged with Newt#1.
+    assert search.get_texts([1, 3]) == ["Newt\n" + "b" * 40 + "\n\n" + "c" * 40, "Elbereth\n" + "d" * 40]
+
+
+def test_retrieval_server_matches_local_search(tmp_path):
+    store = {title: {"raw_text": text} for title, text in DOCUMENTS}
+    (tmp_path / "store.json").write_text(json.dumps(store))
+    BM25Index.build(DOCUMENTS).save(tmp_path / "bm25.json")
+    config = load_config(
+        [
+            "agent.retrieval_mode=lexical",
+            f"agent.nethack_wiki_store={tmp_path / 'store.json'}",
+            f"agent.nethack_wiki_lexical_index={tmp_path / 'bm25.json'}",
+            "agent.nethack_wiki_glyph_lookup=null",
+        ]
+    )
+    local = NethackWikiSearch(config)
+    local.load_index()
+    queries = ["scare monsters", "newt", "escape to the next level"]
+
+    server = RetrievalServer(config, num_clients=2, ctx=multiprocessing.get_context("fork"))
+    server.start()
+    try:
+        assert server.client(1).search_many(queries) == local.search_many(queries)
+        assert server.client(0).search("newt") == local.search("newt")
+    finally:
+        server.stop()
+
+
+def test_retrieval_server_reports_index_load_failure(tmp_path):
+    config = load_config(
+        [
+            "agent.retrieval_mode=lexical",
+            f"agent.nethack_wiki_store={tmp_path / 'missing.json'}",
+            f"agent.nethack_wiki_lexical_index={tmp_path / 'missing_bm25.json'}",
+            "agent.nethack_wiki_glyph_lookup=null",
+        ]
+    )
+    server = RetrievalServer(config, num_clients=1, ctx=multiprocessing.get_context("fork"))
+    server.start()
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="failed to load the wiki index"):
+                server.client(0).search("newt")
+    finally:
+        server.stop()
+
+
+def test_glyph_lookup_drops_stale_passages_and_falls_back_to_titles(tmp_path, caplog):
+    store = {title: {"raw_text": text} for title, text in DOCUMENTS}
+    (tmp_path / "store.json").write_text(json.dumps(store))
+    BM25Index.build(DOCUMENTS).save(tmp_path / "bm25.json")
+    lookup = {
+        "top_k": 2,
+        "entities": {"newt": ["Newt", "Removed article", "Elbereth"], "cockatrice": ["Removed article"]},
+    }
+    (tmp_path / "lookup.json").write_text(json.dumps(lookup))
+    config = load_config(
+        [
+            "agent.retrieval_mode=lexical",
+            "agent.top_k=3",
+            f"agent.nethack_wiki_store={tmp_path / 'store.json'}",
+            f"agent.nethack_wiki_lexical_index={tmp_path / 'bm25.json'}",
+            f"agent.nethack_wiki_glyph_lookup={tmp_path / 'lookup.json'}",
+        ]
+    )
+    search = NethackWikiSearch(config)
+    with caplog.at_level("WARNING", logger="balrog.retrieval.wiki_search"):
+        search.load_index()
+    assert "fewer than top_k=3" in caplog.text
+
+    assert search.lookup_entity("Newt") == [3, 1]
+    # Every passage of the entry is stale, so the title match is used
+    assert search.lookup_entity("cockatrice") == [0]
+    assert search.lookup_entity("wand of digging") == [2]
+    assert search.lookup_entity("uncursed wand of digging (0:4)") == [2]
+    assert search.lookup_entity("kitten") == []
+
+
+def test_int8_path_sits_next_to_the_onnx_model():
+    assert int8_path("models/all-MiniLM-L6-v2.onnx") == "models/all-MiniLM-L6-v2.int8.onnx"
+    assert int8_path("all-MiniLM-L6-v2") == "all-MiniLM-L6-v2.int8.onnx"
+
+
+@pytest.mark.parametrize(
+    "backend, expected",
+    [
+        ("sentence_transformers", ("st", "all-MiniLM-L6-v2")),
+        ("onnx", ("onnx", "model.onnx", "all-MiniLM-L6-v2")),
+        ("onnx_int8", ("onnx", "model.int8.onnx", "all-MiniLM-L6-v2")),
+    ],
+)
+def test_create_encoder_selects_backend(monkeypatch, backend, expected):
+    # Stand-ins that record how each encoder would be constructed, without loading a model
+    monkeypatch.setattr("balrog.retrieval.embedding.SentenceTransformerEncoder", lambda *args, **kwargs: ("st",) + args)
+    monkeypatch.setattr("balrog.retrieval.embedding.OnnxEncoder", lambda *args, **kwargs: ("onnx",) + args)
+    config = load_config(
+        [
+            f"agent.embedding_backend={backend}",
+            "agent.embedding_model=all-MiniLM-L6-v2",
+            "agent.embedding_onnx_path=model.onnx",
+        ]
+    )
+    assert create_encoder(config) == expected
+
+    config.agent.embedding_backend = "tensorflow"
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        create_encoder(config)
+
+
+def test_check_equivalence_compares_retrieval_on_the_index():
+    class Encoder:
+        def __init__(self, embeddings):
+            self.embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        def encode(self, queries):
+            return self.embeddings[: len(queries)]
+
+    index = faiss.IndexFlatL2(2)
+    index.add(np.array([[1, 0], [0.9, 0.1], [0, 1], [-1, 0]], dtype=np.float32))
+    reference = Encoder([[1, 0], [0, 1]])
+
+    report = check_equivalence(reference, Encoder([[0.99, 0.01], [0.01, 0.99]]), ["a", "b"], index, top_k=2)
+    assert report["topk_overlap"] == 1.0
+    assert report["min_cosine"] > 0.99
+
+    # The second query drifts towards another document, without changing the first query
+    report = check_equivalence(reference, Encoder([[1, 0], [-0.6, 0.8]]), ["a", "b"], index, top_k=2)
+    assert report["topk_overlap"] == 0.75
@@ -0,0 +1,273 @@
+import copy
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import anthropic
+import google.generativeai as genai
+import pytest
+from omegaconf import OmegaConf
+
+from balrog.agents.tool_rag import SEARCH_WIKI_TOOL
+from balrog.client import ClaudeWrapper, GoogleGenerativeAIWrapper, OpenAIWrapper
+from balrog.prompt_builder.history import Message
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completions endpoint that calls `search_wiki` once if the prompt mentions a newt."""
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+        messages = body["messages"]
+        tool_results = [message["content"] for message in messages if message["role"] == "tool"]
+
+        if tool_results:
+            message = {"role": "assistant", "content": f"<|ACTION|>{tool_results[-1]}<|END|>"}
+            finish_reason = "stop"
+        elif "newt" in json.dumps(messages) and body.get("tool_choice") == "auto":
+            arguments = json.dumps({"query": "newt"})
+            call = {"id": "call_0", "type": "function", "function": {"name": "search_wiki", "arguments": arguments}}
+            message = {"role": "assistant", "content": None, "tool_calls": [call]}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "<|ACTION|>wait<|END|>"}
+            finish_reason = "stop"
+
+        response = json.dumps(
+            {
+                "id": f"chatcmpl-{len(self.requests)}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClaudeStandInMessages:
+    """Stands in for `Anthropic().messages`, using `search_wiki` once if the prompt mentions a newt.
+
+    Every response reports part of the prompt as read from and written to the prompt cache.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(copy.deepcopy(request))
+        messages = request["messages"]
+        tool_results = [
+            block["content"]
+            for message in messages
+            if isinstance(message["content"], list)
+            for block in message["content"]
+            if block["type"] == "tool_result"
+        ]
+
+        if tool_results:
+            content = [{"type": "text", "text": f"<|ACTION|>{tool_results[-1]}<|END|>"}]
+            stop_reason = "end_turn"
+        elif "newt" in json.dumps(messages) and request["tool_choice"]["type"] == "auto":
+            content = [
+                {"type": "text", "text": "Let me check the wiki."},
+                {"type": "tool_use", "id": "toolu_0", "name": "search_wiki", "input": {"query": "newt"}},
+            ]
+            stop_reason = "tool_use"
+        else:
+            content = [{"type": "text", "text": "<|ACTION|>wait<|END|>"}]
+            stop_reason = "end_turn"
+
+        usage = {"input_tokens": 10, "output_tokens": 5, "cache_read_input_tokens": 4, "cache_creation_input_tokens": 2}
+        return anthropic.types.Message.model_validate(
+            {
+                "id": f"msg_{len(self.requests)}",
+                "type": "message",
+                "role": "assistant",
+                "model": request["model"],
+                "content": content,
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": usage,
+            }
+        )
+
+
+class GeminiStandInModel:
+    """Stands in for `genai.GenerativeModel`, calling `search_wiki` once if the prompt mentions a newt."""
+
+    def __init__(self):
+        self.requests = []
+
+    def generate_content(self, contents, generation_config=None, tools=None, tool_config=None):
+        self.requests.append({"contents": list(contents), "tool_config": tool_config})
+        protos = genai.protos
+        tool_results = [
+            part["function_response"]["response"]["result"]
+            for content in contents
+            if isinstance(content, dict)
+            for part in content["parts"]
+            if isinstance(part, dict) and "function_response" in part
+        ]
+
+        if tool_results:
+            parts = [protos.Part(text=f"<|ACTION|>{tool_results[-1]}<|END|>")]
+        elif "newt" in str(contents) and tool_config["function_calling_config"]["mode"] == "AUTO":
+            parts = [protos.Part(function_call=protos.FunctionCall(name="search_wiki", args={"query": "newt"}))]
+        else:
+            parts = [protos.Part(text="<|ACTION|>wait<|END|>")]
+
+        return protos.GenerateContentResponse(
+            candidates=[protos.Candidate(content=protos.Content(role="model", parts=parts), finish_reason="STOP")],
+            usage_metadata=protos.GenerateContentResponse.UsageMetadata(
+                prompt_token_count=10, candidates_token_count=5, cached_content_token_count=4
+            ),
+        )
+
+
+def client_config(client_name, base_url=None):
+    return OmegaConf.create(
+        {
+            "client_name": client_name,
+            "model_id": "stand-in",
+            "base_url": base_url,
+            "timeout": 10,
+            "generate_kwargs": {"temperature": 0.0, "max_tokens": 64},
+            "max_retries": 1,
+            "delay": 0,
+            "alternate_roles": False,
+        }
+    )
+
+
+def serve(handler):
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    handler.requests = []
+    return server
+
+
+@pytest.fixture
+def client():
+    server = serve(StandInHandler)
+    yield OpenAIWrapper(client_config("vllm", f"http://127.0.0.1:{server.server_port}/v1"))
+    server.shutdown()
+
+
+@pytest.fixture
+def claude_client():
+    client = ClaudeWrapper(client_config("claude"))
+    client._initialized = True
+    client.client = SimpleNamespace(messages=ClaudeStandInMessages())
+    return client
+
+
+@pytest.fixture
+def gemini_client():
+    client = GoogleGenerativeAIWrapper(client_config("gemini"))
+    client._initialize_client()
+    client.model = GeminiStandInModel()
+    return client
+
+
+def test_tool_call_is_run_locally_and_answered_in_the_same_conversation(client):
+    calls = []
+
+    def search_wiki(name, arguments):
+        calls.append((name, arguments))
+        return "newts are harmless"
+
+    response = client.generate_with_tools(
+        [Message(role="user", content="A newt is adjacent east.")], [SEARCH_WIKI_TOOL], search_wiki
+    )
+
+    assert calls == [("search_wiki", {"query": "newt"})]
+    assert response.completion == "<|ACTION|>newts are harmless<|END|>"
+    assert (response.input_tokens, response.output_tokens) == (20, 10)
+    assert len(StandInHandler.requests) == 2
+    assert StandInHandler.requests[1]["tool_choice"] == "none"
+    assert client.ledger.summary()["llm_calls"] == 2
+
+
+def test_no_tool_call_is_a_single_request(client):
+    response = client.generate_with_tools(
+        [Message(role="user", content="Nothing in view.")], [SEARCH_WIKI_TOOL], lambda name, arguments: ""
+    )
+
+    assert response.completion == "<|ACTION|>wait<|END|>"
+    assert len(StandInHandler.requests) == 1
+
+
+def test_claude_tool_use_is_run_locally_and_counts_cached_tokens(claude_client):
+    calls = []
+
+    def search_wiki(name, arguments):
+        calls.append((name, arguments))
+        return "newts are harmless"
+
+    response = claude_client.generate_with_tools(
+        [Message(role="user", content="A newt is adjacent east.")], [SEARCH_WIKI_TOOL], search_wiki
+    )
+
+    assert calls == [("search_wiki", {"query": "newt"})]
+    assert response.completion == "<|ACTION|>newts are harmless<|END|>"
+    # Prompt tokens read from and written to the cache are part of the prompt, as in the ledger
+    assert (response.input_tokens, response.output_tokens) == (32, 10)
+    assert claude_client.ledger.summary()["input_tokens"] == 32
+
+    requests = claude_client.client.messages.requests
+    assert [request["tool_choice"] for request in requests] == [{"type": "auto"}, {"type": "none"}]
+    assert requests[0]["tools"][0]["input_schema"] == SEARCH_WIKI_TOOL["parameters"]
+    assistant, tool_result = requests[1]["messages"][-2:]
+    assert [block["type"] for block in assistant["content"]] == ["text", "tool_use"]
+    assert tool_result["content"] == [
+        {"type": "tool_result", "tool_use_id": "toolu_0", "content": "newts are harmless"}
+    ]
+
+
+def test_gemini_function_call_is_run_locally_and_answered_in_the_same_conversation(gemini_client):
+    calls = []
+
+    def search_wiki(name, arguments):
+        calls.append((name, arguments))
+        return "newts are harmless"
+
+    response = gemini_client.generate_with_tools(
+        [Message(role="user", content="A newt is adjacent east.")], [SEARCH_WIKI_TOOL], search_wiki
+    )
+
+    assert calls == [("search_wiki", {"query": "newt"})]
+    assert response.completion == "<|ACTION|>newts are harmless<|END|>"
+    assert (response.input_tokens, response.output_tokens) == (20, 10)
+    assert gemini_client.ledger.summary()["cached_tokens"] == 8
+
+    requests = gemini_client.model.requests
+    assert [request["tool_config"]["function_calling_config"]["mode"] for request in requests] == ["AUTO", "NONE"]
+    model_turn, function_response = requests[1]["contents"][-2:]
+    assert model_turn.parts[0].function_call.name == "search_wiki"
+    assert function_response["parts"] == [
+        {"function_response": {"name": "search_wiki", "response": {"result": "newts are harmless"}}}
+    ]
+
+
+@pytest.mark.parametrize("client_fixture", ["claude_client", "gemini_client"])
+def test_no_tool_call_is_a_single_request_for_every_provider(request, client_fixture):
+    client = request.getfixturevalue(client_fixture)
+    response = client.generate_with_tools(
+        [Message(role="user", content="Nothing in view.")], [SEARCH_WIKI_TOOL], lambda name, arguments: ""
+    )
+
+    assert response.completion == "<|ACTION|>wait<|END|>"
+    assert client.ledger.summary()["llm_calls"] == 1
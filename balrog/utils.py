@@ -9,6 +9,36 @@ from pathlib import Path
 
 import google.generativeai as genai
 import openai
+from omegaconf import OmegaConf
+
+from balrog.client import cache_hit_rate
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config", "config.yaml")
+
+
+def load_config(overrides=()):
+    """Load the default evaluation config outside of Hydra, e.g. for offline scripts.
+
+    Args:
+        overrides (list, optional): Dotlist overrides such as `["agent.top_k=5"]`. Defaults to ().
+
+    Returns:
+        omegaconf.DictConfig: The merged configuration.
+    """
+    return OmegaConf.merge(OmegaConf.load(CONFIG_PATH), OmegaConf.from_dotlist(list(overrides)))
+
+
+def add_usage_breakdown(total, breakdown):
+    """Add LLM usage per stage or per model, as reported by `UsageLedger.summary`, into `total` in place.
+
+    Args:
+        total (dict): Accumulated usage per stage or model.
+        breakdown (dict): Usage per stage or model to add.
+    """
+    for name, usage in breakdown.items():
+        name_total = total.setdefault(name, {})
+        for field, value in usage.items():
+            name_total[field] = name_total.get(field, 0) + value
 
 
 def collect_and_summarize_results(output_dir):
@@ -38,6 +68,10 @@ def collect_and_summarize_results(output_dir):
     # Summarize results per environment and overall
     overall_total_input_tokens = 0
     overall_total_output_tokens = 0
+    overall_total_cached_tokens = 0
+    overall_total_cost = 0.0
+    overall_usage_by_stage = {}
+    overall_usage_by_model = {}
     overall_env_summaries = {}
     env_avg_progressions = []
     agent_config = None
@@ -49,6 +83,13 @@ def collect_and_summarize_results(output_dir):
         env_total_steps = 0
         env_total_input_tokens = 0
         env_total_output_tokens = 0
+        env_total_cached_tokens = 0
+        env_total_cost = 0.0
+        env_usage_by_stage = {}
+        env_usage_by_model = {}
+        env_cascade_steps = 0
+        env_escalated_steps = 0
+        env_budget_stops = 0
         env_total_episodes = len(episodes)
         env_tasks = defaultdict(list)
 
@@ -65,6 +106,14 @@ def collect_and_summarize_results(output_dir):
             env_total_steps += episode_log.get("num_steps", 0)
             env_total_input_tokens += episode_log.get("input_tokens", 0)
             env_total_output_tokens += episode_log.get("output_tokens", 0)
+            env_total_cached_tokens += episode_log.get("cached_tokens", 0)
+            env_total_cost += episode_log.get("cost_usd", 0.0)
+            add_usage_breakdown(env_usage_by_stage, episode_log.get("usage_by_stage", {}))
+            add_usage_breakdown(env_usage_by_model, episode_log.get("usage_by_model", {}))
+            if "cascade" in episode_log:
+                env_cascade_steps += episode_log["cascade"]["steps"]
+                env_escalated_steps += episode_log["cascade"]["escalated_steps"]
+            env_budget_stops += "budget_stop" in episode_log
 
         # Calculate mean and standard error for the environment
         env_avg_progress = sum(env_episode_progress) / env_total_episodes if env_total_episodes else 0.0
@@ -78,6 +127,10 @@ def collect_and_summarize_results(output_dir):
 
         overall_total_input_tokens += env_total_input_tokens
         overall_total_output_tokens += env_total_output_tokens
+        overall_total_cached_tokens += env_total_cached_tokens
+        overall_total_cost += env_total_cost
+        add_usage_breakdown(overall_usage_by_stage, env_usage_by_stage)
+        add_usage_breakdown(overall_usage_by_model, env_usage_by_model)
 
         env_task_summaries = {}
         for task_name, task_runs in env_tasks.items():
@@ -107,7 +160,15 @@ def collect_and_summarize_results(output_dir):
             "tasks": env_task_summaries,
             "input_tokens": env_total_input_tokens,
             "output_tokens": env_total_output_tokens,
+            "cached_tokens": env_total_cached_tokens,
+            "cache_hit_rate": cache_hit_rate(env_total_cached_tokens, env_total_input_tokens),
+            "cost_usd": env_total_cost,
+            "usage_by_stage": env_usage_by_stage,
+            "usage_by_model": env_usage_by_model,
+            "episodes_stopped_by_budget": env_budget_stops,
         }
+        if env_cascade_steps:
+            env_summary["escalation_rate"] = env_escalated_steps / env_cascade_steps
 
         env_summary_filename = os.path.join(output_dir, env_name, f"{env_name}_summary.json")
         Path(env_summary_filename).parent.mkdir(parents=True, exist_ok=True)
@@ -136,6 +197,11 @@ def collect_and_summarize_results(output_dir):
         "environments": overall_env_summaries,
         "total_input_tokens": overall_total_input_tokens,
         "total_output_tokens": overall_total_output_tokens,
+        "total_cached_tokens": overall_total_cached_tokens,
+        "cache_hit_rate": cache_hit_rate(overall_total_cached_tokens, overall_total_input_tokens),
+        "total_cost_usd": overall_total_cost,
+        "usage_by_stage": overall_usage_by_stage,
+        "usage_by_model": overall_usage_by_model,
         "client": client_config,
         "agent": agent_config,
     }
@@ -154,6 +220,11 @@ def print_summary_table(summary):
     """
     print("\nSummary of Results:")
     print(f"Overall Average Progression: {summary['average_progress']:.2f}% ± {summary['standard_error']:.2f}%")
+    print(
+        f"Tokens: {summary['total_input_tokens']} in ({summary['total_cached_tokens']} cached, "
+        f"{100 * summary['cache_hit_rate']:.1f}%), "
+        f"{summary['total_output_tokens']} out, estimated cost: ${summary['total_cost_usd']:.4f}"
+    )
     print("Per-Environment Results:")
     for env_name, env_data in summary["environments"].items():
         print(
@@ -36,11 +36,16 @@ setup(
         "minigrid @ git+https://github.com/BartekCupial/Minigrid.git",
         "baba @ git+https://github.com/nacloos/baba-is-ai.git",
         "sentence_transformers",
-        "faiss-cpu"
+        "faiss-cpu",
     ],
     entry_points={
         "console_scripts": [
             "balrog-post-install=balrog.scripts.post_install:main",
+            "balrog-build-wiki-index=balrog.scripts.build_wiki_index:main",
+            "balrog-build-glyph-lookup=balrog.scripts.build_glyph_lookup:main",
+            "balrog-bench-retrieval=balrog.scripts.bench_retrieval:main",
+            "balrog-bench-observation=balrog.scripts.bench_observation:main",
+            "balrog-export-embedding-model=balrog.scripts.export_embedding_model:main",
         ],
     },
     extras_require={
@@ -51,7 +56,12 @@ setup(
             "flake8",
             "pre-commit",
             "twine",
-        ]
+        ],
+        "onnx": [
+            "onnx",
+            "onnxruntime",
+            "transformers",
+        ],
     },
     package_dir={"": "./"},
     packages=setuptools.find_packages(where="./", include=["balrog*"]),
@@ -60,7 +70,8 @@ setup(
             "config/config.yaml",
             "environments/nle/achievements.json",
             "environments/nle/Hack-Regular.ttf",
-            "environments/nle/tiles.pkl",
+            "environments/nle/tiles.npy",
+            "environments/nle/glyph2tile.npy",
             "environments/nle/Tiles16x16.png",
         ]
     },